@@ -0,0 +1,96 @@
+# time preprocess_ap() with the indexed UP argument lookup (UPSentence.core_arguments) against the scan
+# over all UP tokens it replaced, on a long synthetic sentence with many obl/nmod nodes, e.g.:
+#   python scripts/bench_preprocess_ap.py --num-tokens 150
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ud2ccg.reader import UDToken, UPToken, UPSentence, core_argument_labels
+from ud2ccg.dtree import DTree
+from ud2ccg.preprocessing import preprocess_ap
+
+
+# preprocess_ap() before UPSentence.core_arguments: the argheads of every UP token are parsed for each obl/nmod node
+def preprocess_ap_scan(dtree, up_sentence):
+    for node in dtree.dtree.nodes():
+        if dtree.get_deprel(node) in ['obl', 'nmod']:
+            ud_head = dtree.get_head(node)
+
+            has_case = False
+            node_children = dtree.get_children(node, only_edges='case')
+            if node_children and len(node_children) > 0:
+                has_case = True
+
+            to_change_label = False
+            if has_case:
+                for up_token in up_sentence.sentence:
+                    if up_token.idx == ud_head and up_token.argheads != "_":
+                        for part in up_token.argheads.split("|"):
+                            first_colon_idx = part.index(":")
+                            label = part[:first_colon_idx]
+                            arg_idx = int(part[first_colon_idx + 1:])
+
+                            if arg_idx == node and label in core_argument_labels:
+                                to_change_label = True
+
+            if to_change_label:
+                dtree.set_deprel(node, "obl-ap")
+
+
+# a sentence alternating obl/nmod nouns and their case markers, with num_args UP arguments per token
+def make_sentence(rng, num_tokens, num_args):
+    sentence = list()
+    for idx in range(1, num_tokens + 1):
+        if idx == 1:
+            sentence.append(UDToken(idx, f'w{idx}', 'VERB', '_', 0, 'root', '_'))
+        elif idx % 2 == 0:
+            sentence.append(UDToken(idx, f'w{idx}', 'NOUN', '_', rng.choice(range(1, idx, 2)),
+                                    rng.choice(['obl', 'nmod']), '_'))
+        else:
+            sentence.append(UDToken(idx, f'w{idx}', 'ADP', '_', idx - 1, 'case', '_'))
+
+    up_tokens = list()
+    for idx in range(1, num_tokens + 1):
+        argheads = '|'.join(f'{rng.choice(["A0", "A1", "AM-TMP", "ARG2"])}:{rng.randrange(2, num_tokens, 2)}'
+                            for _ in range(num_args))
+        up_tokens.append(UPToken(idx, argheads, '_'))
+
+    return sentence, UPSentence(up_tokens, 'bench')
+
+
+# best time of repeat runs of function on a fresh dtree, and the number of nodes relabeled obl-ap
+def bench(function, sentence, up_sentence, repeat):
+    times = list()
+    for _ in range(repeat):
+        dtree = DTree.from_sentence(sentence)
+        start = time.perf_counter()
+        function(dtree, up_sentence)
+        times.append(time.perf_counter() - start)
+
+    num_relabeled = sum(1 for node in dtree.dtree.nodes() if dtree.get_deprel(node) == 'obl-ap')
+    return min(times), num_relabeled
+
+
+def main(args):
+    sentence, up_sentence = make_sentence(random.Random(args.seed), args.num_tokens, args.num_args)
+
+    for name, function in [('scan', preprocess_ap_scan), ('indexed', preprocess_ap)]:
+        best, num_relabeled = bench(function, sentence, up_sentence, args.repeat)
+        print(f'{name:<8}: {best * 1e3:.2f} ms, {num_relabeled} nodes relabeled obl-ap')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-tokens', action='store', type=int, default=150, dest='num_tokens',
+                        help='number of tokens of the sentence')
+    parser.add_argument('--num-args', action='store', type=int, default=6, dest='num_args',
+                        help='number of UP arguments of each token')
+    parser.add_argument('--repeat', action='store', type=int, default=20, dest='repeat',
+                        help='number of runs, of which the best is reported')
+    parser.add_argument('--seed', action='store', type=int, default=0, dest='seed',
+                        help='seed of the synthetic sentence')
+    main(parser.parse_args())
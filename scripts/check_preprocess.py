@@ -0,0 +1,112 @@
+# check that the single-pass preprocess() relabels every node of a sentence the same way as
+# preprocess_ap(), preprocess_conj() and preprocess_ref() called one after the other,
+# on the sentences of the given files (with and without their UP sentences) and on random trees.
+# exits with status 1 if any sentence differs, e.g.:
+#   python scripts/check_preprocess.py --conllu-path en_ewt-ud-dev.conllu --up-conllup-path en_ewt-up-dev.conllup
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ud2ccg.reader import read_conllu, read_conllup, UDToken, UPToken, UPSentence
+from ud2ccg.dtree import DTree
+from ud2ccg.preprocessing import preprocess, preprocess_ap, preprocess_conj, preprocess_ref
+
+
+# deprels of each node after preprocessing, or the type of the exception raised
+def _relabel(sentence, up_sentence, single_pass):
+    dtree = DTree.from_sentence(sentence)
+    try:
+        if single_pass:
+            preprocess(dtree, up_sentence)
+        else:
+            if up_sentence is not None:
+                preprocess_ap(dtree, up_sentence)
+            preprocess_conj(dtree)
+            preprocess_ref(dtree)
+    except Exception as e:
+        return type(e)
+    return {node: dtree.get_deprel(node) for node in dtree.dtree.nodes()}
+
+
+# return True if both ways of preprocessing give the same deprels
+def check_sentence(name, sentence, up_sentence):
+    three_pass = _relabel(sentence, up_sentence, single_pass=False)
+    single_pass = _relabel(sentence, up_sentence, single_pass=True)
+    if three_pass != single_pass:
+        print(f'{name}: three passes {three_pass}, single pass {single_pass}')
+        return False
+    return True
+
+
+# a random sentence of num_tokens tokens, with a random UP sentence,
+# biased towards the deprels and EUD relations the preprocessing steps look at
+def random_sentence(rng, num_tokens):
+    deprels = ['nmod', 'obl', 'conj', 'conj', 'nsubj', 'case', 'obj', 'amod']
+
+    sentence = list()
+    for idx in range(1, num_tokens + 1):
+        if idx == 1:
+            head, deprel = 0, 'root'
+        else:
+            head = rng.choice([other for other in range(1, num_tokens + 1) if other != idx])
+            deprel = rng.choice(deprels)
+
+        eud = [f'{head}:{deprel}']
+        if rng.random() < 0.3:
+            eud.append(f'{rng.randint(1, num_tokens)}:ref')
+        if rng.random() < 0.2:
+            eud.append(f'{rng.randint(1, num_tokens)}:nsubj')
+
+        sentence.append(UDToken(idx, 'w', 'NOUN', '_', head, deprel, '|'.join(eud)))
+
+    up_tokens = list()
+    for idx in range(1, num_tokens + 1):
+        argheads = '|'.join(f'{rng.choice(["A0", "A1", "AM"])}:{rng.randint(1, num_tokens)}' for _ in range(3))
+        up_tokens.append(UPToken(idx, argheads, '_'))
+
+    return sentence, UPSentence(up_tokens, 'random')
+
+
+def main(args):
+    num_checked = 0
+    num_differ = 0
+
+    if args.conllu_path is not None:
+        ud_sentences = read_conllu(args.conllu_path)
+        up_sentences = dict()
+        if args.up_conllup_path is not None:
+            up_sentences = read_conllup(args.up_conllup_path, args.conllu_path)
+
+        for ud_sentence in ud_sentences:
+            for up_sentence in [up_sentences.get(ud_sentence.sent_id), None]:
+                num_checked += 1
+                if not check_sentence(ud_sentence.sent_id, ud_sentence.sentence, up_sentence):
+                    num_differ += 1
+
+    rng = random.Random(args.seed)
+    for i in range(args.num_random):
+        sentence, up_sentence = random_sentence(rng, rng.randint(2, 12))
+        for up in [up_sentence, None]:
+            num_checked += 1
+            if not check_sentence(f'random-{i}', sentence, up):
+                num_differ += 1
+
+    print(f'{num_checked} sentences checked, {num_differ} differ')
+    if num_differ > 0:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--conllu-path', action='store', dest='conllu_path',
+                        help='path to .conllu file whose sentences are checked')
+    parser.add_argument('--up-conllup-path', action='store', dest='up_conllup_path',
+                        help='path to the UP .conllup file of the .conllu file')
+    parser.add_argument('--num-random', action='store', type=int, default=20000, dest='num_random',
+                        help='number of random sentences checked')
+    parser.add_argument('--seed', action='store', type=int, default=5, dest='seed',
+                        help='seed of the random sentences')
+    main(parser.parse_args())
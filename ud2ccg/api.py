@@ -0,0 +1,232 @@
+import json
+from collections import namedtuple
+from ud2ccg.reader import read_conllu_lines, read_sud_conllu_lines, read_conllup_lines
+from ud2ccg.budget import SentenceBudget, BudgetExceeded
+from ud2ccg.metrics import StageTimer
+from ud2ccg.utils import check_crossing_dependencies
+from ud2ccg.transform import convert_single, fix_sentence, to_compact, patch_compact, choose_default_slash, \
+    format_auto_record
+
+
+# the result of converting one sentence:
+# - sent_id, words = as in the input
+# - supertags = supertag of each token, as a string (None if the sentence was skipped)
+# - auto = the derivation in .auto format (None if the sentence was skipped)
+# - complete = whether every category of the supertags is assigned (see SentenceStatus)
+# - skipped = why the sentence was not converted (crossing dependencies, or the budget it went over), else None
+# - timings = seconds spent in each stage of the pipeline
+SentenceResult = namedtuple("SentenceResult",
+                            ["sent_id", "words", "supertags", "auto", "complete", "skipped", "timings"])
+
+
+# split CoNLL-U text into sentence blocks, each a list of lines.
+# data is a string, or an iterable of strings that are either single lines (e.g. a file object)
+# or whole sentence blocks; a block ends at an empty line, or at the end of a string holding several lines
+def iter_conllu_blocks(data):
+    if isinstance(data, str):
+        data = [data]
+
+    block = list()
+    for chunk in data:
+        lines = chunk.splitlines(keepends=True)
+        for line in lines:
+            if line.strip() == "":
+                if block:
+                    yield block
+                    block = list()
+            else:
+                block.append(line)
+
+        if len(lines) > 1 and block:
+            yield block
+            block = list()
+
+    if block:
+        yield block
+
+
+# read a block with reader (one of the line-based readers of ud2ccg.reader);
+# the readers expect well-formed input, so any error they raise means the block is malformed
+def _read_lines(reader, name, block):
+    try:
+        return reader(block)
+    except Exception as e:
+        raise ValueError(f"malformed {name} sentence: {type(e).__name__}: {e}") from e
+
+
+# read one sentence block with its SUD and UP blocks (None if not given);
+# sud_blocks and up_blocks are the iterators of SUD and UP blocks (None if not given);
+# the time spent reading each of them is added to timer
+def _read_block(timer, ud_block, sud_blocks=None, up_blocks=None):
+    clock = timer.clock()
+    ud_sentences = _read_lines(read_conllu_lines, 'UD', ud_block)
+    clock.lap('read_ud')
+    if len(ud_sentences) == 0:
+        return None, None, None
+    ud_sentence = ud_sentences[0]
+    sent_id = ud_sentence.sent_id
+
+    sud_sentence = None
+    if sud_blocks is not None:
+        sud_block = next(sud_blocks, None)
+        if sud_block is None:
+            raise ValueError(f"no SUD sentence for UD sentence {sent_id}")
+        sud_sentences = _read_lines(read_sud_conllu_lines, 'SUD', sud_block)
+        if sent_id not in sud_sentences:
+            raise ValueError(f"SUD sentence {', '.join(sud_sentences)} does not match UD sentence {sent_id}")
+        sud_sentence = sud_sentences[sent_id]
+        clock.lap('read_sud')
+
+    up_sentence = None
+    if up_blocks is not None:
+        up_block = next(up_blocks, None)
+        if up_block is None:
+            raise ValueError(f"no UP sentence for UD sentence {sent_id}")
+        try:
+            up_sentences = read_conllup_lines(up_block, ud_block)
+        except KeyError as e:
+            # the sent_id of the UP block is not that of the UD block
+            raise ValueError(f"UP sentence {e.args[0]} does not match UD sentence {sent_id}")
+        except Exception as e:
+            raise ValueError(f"malformed UP sentence for UD sentence {sent_id}: {type(e).__name__}: {e}") from e
+        if sent_id not in up_sentences:
+            raise ValueError(f"UP sentence {', '.join(up_sentences)} does not match UD sentence {sent_id}")
+        up_sentence = up_sentences[sent_id]
+        clock.lap('read_up')
+
+    return ud_sentence, sud_sentence, up_sentence
+
+
+def _timings(timer):
+    return {name: stage['time'] for name, stage in timer.to_dict().items()}
+
+
+def _skipped(ud_sentence, reason, timer):
+    return SentenceResult(sent_id=ud_sentence.sent_id,
+                          words=[token.form for token in ud_sentence.sentence],
+                          supertags=None,
+                          auto=None,
+                          complete=False,
+                          skipped=reason,
+                          timings=_timings(timer))
+
+
+def _converted(compact, timer):
+    return SentenceResult(sent_id=compact.sent_id,
+                          words=compact.words,
+                          supertags=compact.tags,
+                          auto=compact.auto,
+                          complete=compact.complete,
+                          skipped=None,
+                          timings=_timings(timer))
+
+
+# convert CoNLL-U text held in memory, yielding a SentenceResult per sentence, in order.
+# conllu (and sud and up, if given) is a string or an iterable of lines or sentence blocks
+# (see iter_conllu_blocks()); SUD and UP blocks must come in the same order as the UD blocks.
+# with a default slash direction ('/' or '\\'), each sentence is yielded as soon as it is converted;
+# without one, the whole input is converted first and the most common slash direction is used,
+# which gives the same results as convert_conllu(); until then, each sentence is only kept
+# as a CompactSentence with placeholders (see to_compact()).
+# nothing is logged or written to disk
+def convert_sentences(conllu, up=None, sud=None, default_slash=None, convert_crossing_dependencies=False,
+                      max_height=27, max_nodes=None, max_categories=None, max_time=None):
+    budget = SentenceBudget(max_height, max_nodes, max_categories, max_time)
+
+    slash_stats = dict()
+    slash_stats['/'] = 0
+    slash_stats['\\'] = 0
+
+    ud_blocks = iter_conllu_blocks(conllu)
+    sud_blocks = iter_conllu_blocks(sud) if sud is not None else None
+    up_blocks = iter_conllu_blocks(up) if up is not None else None
+
+    # without a default slash direction: SentenceResults of skipped sentences,
+    # and (CompactSentence, timer) of converted ones
+    first_pass = list()
+
+    for ud_block in ud_blocks:
+        timer = StageTimer()
+        ud_sentence, sud_sentence, up_sentence = _read_block(timer, ud_block, sud_blocks, up_blocks)
+        if ud_sentence is None:
+            continue
+
+        if not convert_crossing_dependencies and check_crossing_dependencies(ud_sentence.sentence):
+            result = _skipped(ud_sentence, 'crossing dependencies', timer)
+        else:
+            try:
+                toks, tags, btree, dtree, status = convert_single(ud_sentence, sud_sentence, up_sentence,
+                                                                  slash_stats, budget=budget, timer=timer)
+            except BudgetExceeded as e:
+                result = _skipped(ud_sentence, e.reason, timer)
+            else:
+                result = (ud_sentence.sent_id, toks, tags, btree, dtree, status, timer)
+
+        if isinstance(result, SentenceResult):
+            if default_slash is not None:
+                yield result
+            else:
+                first_pass.append(result)
+        elif default_slash is not None:
+            yield _converted(fix_sentence(*result[:6], default_slash, result[6]), result[6])
+        else:
+            first_pass.append((to_compact(*result), result[6]))
+
+    if default_slash is None:
+        default_slash = choose_default_slash(slash_stats)
+        for result in first_pass:
+            if isinstance(result, SentenceResult):
+                yield result
+                continue
+
+            compact, timer = result
+            if compact.pending:
+                clock = timer.clock()
+                compact = patch_compact(compact, default_slash)
+                clock.lap('fixups')
+            yield _converted(compact, timer)
+
+
+# convert a single sentence block (see convert_sentences())
+def convert_sentence(conllu, up=None, sud=None, default_slash='\\', **options):
+    for result in convert_sentences(conllu, up=up, sud=sud, default_slash=default_slash, **options):
+        return result
+    return None
+
+
+# convert the CoNLL-U sentences read from f_in (e.g. stdin) and write them to f_out:
+# as .auto records (output_format='auto'), or as JSON lines with the supertags of each sentence (output_format='jsonl').
+# .auto output leaves out the sentences that were skipped; JSON lines include them, with their skip reason.
+# with complete_output_only, only complete sentences are written, in either format.
+# f_up and f_sud are optional files with the UP and SUD sentences, in the same order.
+# other options are passed to convert_sentences(). with a default slash direction (default_slash), each sentence
+# is written as soon as it is converted; without one (the default of --stdin), nothing is written
+# before the end of the input, since the most common slash direction is only known then,
+# and the rendered text of every converted sentence is kept in memory until then.
+# returns the number of sentences read and written
+def convert_stream(f_in, f_out, output_format='auto', f_up=None, f_sud=None, complete_output_only=False, **options):
+    num_read = 0
+    num_written = 0
+    for result in convert_sentences(f_in, up=f_up, sud=f_sud, **options):
+        num_read += 1
+
+        if complete_output_only and not result.complete:
+            continue
+
+        if output_format == 'jsonl':
+            f_out.write(json.dumps({'sent_id': result.sent_id,
+                                    'words': result.words,
+                                    'supertags': result.supertags,
+                                    'complete': result.complete,
+                                    'skipped': result.skipped}) + '\n')
+        elif result.skipped is None:
+            f_out.write(format_auto_record(result.sent_id, result.auto))
+        else:
+            continue
+
+        # hand each sentence on to the next process in the pipeline right away;
+        # this blocks while its reader is behind
+        f_out.flush()
+        num_written += 1
+
+    return num_read, num_written
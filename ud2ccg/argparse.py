@@ -22,8 +22,21 @@ def parse_args():
     parser.add_argument('--sud-conllu-path', action='store', dest='sud_conllu_path',
                         help='path to SUD .conllu file')
 
-    parser.add_argument('--export-path', action='store', dest='export_path', required=True,
-                        help='where converted treebank(s) should be stored')
+    parser.add_argument('--export-path', action='store', dest='export_path',
+                        help='where converted treebank(s) should be stored (not used with --stdin)')
+
+    parser.add_argument('--stdin', action='store_true', default=False, dest='stdin',
+                        help='read CoNLL-U sentences from stdin and write each converted sentence to stdout '
+                             'as soon as it is done, instead of converting files')
+
+    parser.add_argument('--output-format', action='store', choices=['auto', 'jsonl'], default='auto',
+                        dest='output_format',
+                        help='with --stdin, write .auto records or JSON lines with the supertags of each sentence')
+
+    parser.add_argument('--default-slash', action='store', choices=['/', '\\'], default=None, dest='default_slash',
+                        help='with --stdin, the default slash direction; without it, all of stdin is read and '
+                             'converted before any output, to determine the most common slash direction '
+                             '(only the rendered text of each sentence is kept until then)')
 
     parser.add_argument('--convert-crossing-dependencies', action='store_true', default=False,
                         dest='convert_crossing_dependencies',
@@ -33,9 +46,134 @@ def parse_args():
                         dest='complete_output_only',
                         help='only export fully converted trees')
 
+    parser.add_argument('--profile-rules', action='store_true', default=False,
+                        dest='profile_rules',
+                        help='record per-rule call counts, timings and allocations (written to .profile.json)')
+
+    parser.add_argument('--incremental', action='store_true', default=False,
+                        dest='incremental',
+                        help='only reconvert sentences affected by changed rules or inputs '
+                             '(results are cached in .cache files next to the output)')
+
+    parser.add_argument('--num-workers', action='store', type=int, default=1,
+                        dest='num_workers',
+                        help='number of processes converting sentences of a .conllu file in parallel')
+
+    parser.add_argument('--num-jobs', action='store', type=int, default=1, dest='num_jobs',
+                        help='number of .conllu files converted concurrently, largest first (with --ud-path); '
+                             'the log of each file is written next to its output')
+
+    parser.add_argument('--batch-size', action='store', type=int, default=64,
+                        dest='batch_size',
+                        help='number of sentences sent to a worker process at once (with --num-workers > 1)')
+
+    parser.add_argument('--low-memory', action='store_true', default=False, dest='low_memory',
+                        help='spill converted sentences to a temporary file instead of keeping their trees in memory')
+
+    parser.add_argument('--slash-priors', action='store', dest='slash_priors_path',
+                        help='path to a slash-direction prior table (.json); files of treebanks or languages in '
+                             'the table are converted in a single pass with the default slash direction from the table')
+
+    parser.add_argument('--slash-priors-from-train', action='store_true', default=False,
+                        dest='slash_priors_from_train',
+                        help='convert the train split of each treebank first and use its default slash direction '
+                             'for the other splits (with --ud-path)')
+
+    parser.add_argument('--export-slash-priors', action='store', dest='export_slash_priors_path',
+                        help='where to write the slash-direction counts of the converted treebanks, '
+                             'to be used with --slash-priors')
+
+    parser.add_argument('--compress-output', action='store_true', default=False, dest='compress_output',
+                        help='write gzip-compressed .auto.gz and .lexicon.gz files')
+
+    parser.add_argument('--export-binary', action='store_true', default=False, dest='export_binary',
+                        help='also write the derivations in a packed binary format (.deriv, never compressed) that '
+                             'can be memory-mapped, see ud2ccg.packed.PackedDerivationReader')
+
+    parser.add_argument('--max-height', action='store', type=int, default=27, dest='max_height',
+                        help='sentences whose binary tree is higher than this are quarantined')
+
+    parser.add_argument('--max-nodes', action='store', type=int, default=None, dest='max_nodes',
+                        help='sentences whose binary tree has more nodes than this are quarantined')
+
+    parser.add_argument('--max-categories', action='store', type=int, default=None, dest='max_categories',
+                        help='sentences allocating more categories than this during conversion are quarantined')
+
+    parser.add_argument('--max-time', action='store', type=float, default=None, dest='max_time',
+                        help='sentences taking longer than this (in seconds) to convert are quarantined')
+
+    parser.add_argument('--dedup-cache-size', action='store', type=int, default=0, dest='dedup_cache_size',
+                        help='number of converted sentences to keep in memory, so that sentences with the same input '
+                             'are converted only once (0 to disable); head indices in the output are then numbered '
+                             'differently, but the derivations are the same')
+
+    parser.add_argument('--result-store', action='store', dest='result_store_path',
+                        help='path to a result store (.sqlite) shared by all runs using it; sentences whose input '
+                             'and converter are unchanged since an earlier run take their result from the store '
+                             'instead of being converted again (head indices in the output are then numbered '
+                             'differently, but the derivations are the same)')
+
+    parser.add_argument('--result-store-size', action='store', type=int, default=1024, dest='result_store_size',
+                        help='maximum size of the results in the result store, in MB; the results used least '
+                             'recently are evicted first')
+
+    parser.add_argument('--force', action='store_true', default=False, dest='force',
+                        help='reconvert files whose outputs are up to date according to the manifest in the export path')
+
+    parser.add_argument('--merge-lexicons', action='store_true', default=False, dest='merge_lexicons',
+                        help='merge the lexicons of all converted files into a global lexicon and one per language, '
+                             'written to <export path>/lexicon')
+
     parser.add_argument('--debug', action='store_true', default=False, dest='debug',
                         help='print debug statements when running')
 
     args = parser.parse_args()
 
     return args
+
+
+def parse_server_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--host', action='store', default='127.0.0.1', dest='host',
+                        help='address to listen on')
+
+    parser.add_argument('--port', action='store', type=int, default=8000, dest='port',
+                        help='port to listen on (0 for any free port)')
+
+    parser.add_argument('--socket', action='store', dest='socket_path',
+                        help='listen on this Unix socket instead of --host and --port')
+
+    parser.add_argument('--num-workers', action='store', type=int, default=1, dest='num_workers',
+                        help='number of worker processes converting batches of requests '
+                             '(1 to convert in the server process)')
+
+    parser.add_argument('--batch-size', action='store', type=int, default=16, dest='batch_size',
+                        help='maximum number of requests converted together by a worker')
+
+    parser.add_argument('--max-wait', action='store', type=float, default=0.002, dest='max_wait',
+                        help='how long to wait (in seconds) for more requests to fill a batch')
+
+    parser.add_argument('--default-slash', action='store', choices=['/', '\\'], default=None, dest='default_slash',
+                        help='default slash direction of requests that do not give one; if not given, '
+                             'the most common slash direction of each request is used')
+
+    parser.add_argument('--convert-crossing-dependencies', action='store_true', default=False,
+                        dest='convert_crossing_dependencies',
+                        help='whether to convert trees with crossing dependencies or not')
+
+    parser.add_argument('--max-height', action='store', type=int, default=27, dest='max_height',
+                        help='sentences whose binary tree is higher than this are skipped')
+
+    parser.add_argument('--max-nodes', action='store', type=int, default=None, dest='max_nodes',
+                        help='sentences whose binary tree has more nodes than this are skipped')
+
+    parser.add_argument('--max-categories', action='store', type=int, default=None, dest='max_categories',
+                        help='sentences allocating more categories than this during conversion are skipped')
+
+    parser.add_argument('--max-time', action='store', type=float, default=None, dest='max_time',
+                        help='sentences taking longer than this (in seconds) to convert are skipped')
+
+    args = parser.parse_args()
+
+    return args
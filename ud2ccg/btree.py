@@ -1,6 +1,7 @@
 import networkx as nx
 import networkx.algorithms.dag as nx_dag
 from ud2ccg.config.config import read_obliqueness_hierarchy
+from ud2ccg.rules.apply import RULES, resolve_rule
 
 
 # TODO move to config file
@@ -9,8 +10,12 @@ obliqueness_hierarchy = read_obliqueness_hierarchy(obliqueness_hierarchy_path)
 
 
 class BTree:
-    def __init__(self, btree=None):
+    def __init__(self, btree=None, order=None):
         self.btree = btree
+        # list of (node, rule) in top-down order, see get_top_down_order()
+        self.order = order
+        # list of ConjSpan, see rules.apply.assign_conj_groups()
+        self.conj_spans = []
 
     @staticmethod
     def from_dtree(dtree):
@@ -73,7 +78,7 @@ class BTree:
                            feature=None,
                            category=None,
                            category_type=None,
-                           conj='')
+                           rule=RULES['token'])
 
             for child in sorted_children:
                 this_deprel = dtree.get_deprel(child)
@@ -91,7 +96,7 @@ class BTree:
                                feature=feature,
                                category=None,
                                category_type=None,
-                               conj='')
+                               rule=resolve_rule(this_deprel))
 
                 btree.add_edge(temp_root, btree_parent)
                 btree_child = _binarize(btree, dtree, child)
@@ -113,13 +118,32 @@ class BTree:
 
         # root = 0
         # root only has one child
-        _binarize(btree, dtree, dtree.get_root())
+        btree_root = _binarize(btree, dtree, dtree.get_root())
+
+        # precompute the top-down (pre-order) traversal used when applying rules;
+        # children are visited in the same order as returned by get_children()
+        order = []
+        stack = [btree_root]
+        while len(stack) > 0:
+            node = stack.pop()
+            order.append((node, btree.nodes[node]['rule']))
+            children = sorted(btree.successors(node))
+            for child in reversed(children):
+                if child != node:
+                    stack.append(child)
 
-        return BTree(btree)
+        return BTree(btree, order)
 
     def tree(self):
         return self.btree
 
+    def get_top_down_order(self):
+        return self.order
+
+    # names of the rule functions applied to this tree
+    def get_fired_rules(self):
+        return frozenset(rule.__name__ for _, rule in self.order)
+
     def get_btree_node(self, node):
         return self.btree.nodes[node]
 
@@ -0,0 +1,57 @@
+import time
+from ud2ccg.cat import Index
+
+
+# raised when the conversion of a sentence goes over its budget (see SentenceBudget)
+class BudgetExceeded(Exception):
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+# limits on the work spent converting one sentence; limits set to None are not checked:
+# - max_height = height of the binary tree
+# - max_nodes = number of nodes of the binary tree
+# - max_categories = number of categories allocated (counted with the Index counter, see RuleProfiler)
+# - max_time = wall time in seconds, checked between stages and after every rule
+class SentenceBudget:
+    def __init__(self, max_height=27, max_nodes=None, max_categories=None, max_time=None):
+        self.max_height = max_height
+        self.max_nodes = max_nodes
+        self.max_categories = max_categories
+        self.max_time = max_time
+
+        self.start_time = None
+        self.start_index = None
+
+    # whether check() has anything to check, i.e. whether it needs to be called during rule application
+    @property
+    def is_checked(self):
+        return self.max_categories is not None or self.max_time is not None
+
+    # start counting for a new sentence
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.start_index = Index.next_id()
+
+    def check_btree(self, btree):
+        if self.max_nodes is not None:
+            num_nodes = btree.tree().number_of_nodes()
+            if num_nodes > self.max_nodes:
+                raise BudgetExceeded(f'nodes {num_nodes} > {self.max_nodes}')
+
+        if self.max_height is not None:
+            height = btree.height()
+            if height > self.max_height:
+                raise BudgetExceeded(f'height {height} > {self.max_height}')
+
+    def check(self):
+        if self.max_categories is not None:
+            num_categories = Index.next_id() - self.start_index
+            if num_categories > self.max_categories:
+                raise BudgetExceeded(f'categories {num_categories} > {self.max_categories}')
+
+        if self.max_time is not None:
+            elapsed = time.perf_counter() - self.start_time
+            if elapsed > self.max_time:
+                raise BudgetExceeded(f'time {elapsed:.3f}s > {self.max_time}s')
@@ -66,6 +66,32 @@ class Index:
     def __str__(self) -> str:
         return str(self.value)
 
+    @staticmethod
+    def next_id() -> int:
+        return Index.__next_id
+
+
+# reference to the head of the token at position pos, for rules that need it before
+# the supertag of that token is known; convert_single() replaces it with the Index of that supertag.
+# written as "<pos>:t"
+class TokenIndex:
+    __slots__ = ('pos',)
+
+    def __init__(self, pos: int):
+        self.pos = pos
+
+    def __str__(self) -> str:
+        return f'{self.pos}:t'
+
+    def __repr__(self) -> str:
+        return str(self)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, TokenIndex) and self.pos == other.pos
+
+    def __hash__(self) -> int:
+        return hash((TokenIndex, self.pos))
+
 
 class Category(object):
     @property
@@ -256,6 +282,9 @@ class VariableCategory(Category):
     # easy-to-read unique identifier for each object created
     __next_id = 0
 
+    # number of variables bound to a category so far (see update())
+    num_bindings = 0
+
     def __init__(self):
         self.id = VariableCategory.__next_id
         self.index = Index()
@@ -272,6 +301,7 @@ class VariableCategory(Category):
         return True
 
     def update(self, cat: Category, keep_index=True):
+        VariableCategory.num_bindings += 1
         old_index = self.index
         self.__dict__.clear()
         self.__dict__.update(cat.__dict__)
@@ -280,6 +310,17 @@ class VariableCategory(Category):
             self.index = old_index
 
 
+# apply the default slash direction and default category to the unresolved categories of a sentence,
+# i.e. its functors with an undirected slash '|' and its variable categories (see SentenceStatus);
+# same as calling apply_default_slash_direction() and apply_default_category() on every supertag of the sentence
+def apply_defaults(unresolved, default_slash):
+    for cat in unresolved:
+        if cat.is_variable:
+            apply_default_category(cat)
+        else:
+            cat.slash = default_slash
+
+
 def apply_default_slash_direction(cat, default_slash):
     if isinstance(cat, Functor):
         if cat.slash == '|':
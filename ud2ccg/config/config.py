@@ -11,3 +11,43 @@ def read_obliqueness_hierarchy(path):
             obliqueness_hierarchy[obj['name']] = obj['priority']
 
         return obliqueness_hierarchy
+
+
+# slash-direction priors: counts of S/NP and S\NP categories (see collect_slash_stats() in transform.py),
+# keyed by treebank name (e.g. en_ewt) or language code (e.g. en)
+def read_slash_priors(path):
+    slash_priors = {}
+
+    with open(path, 'r') as f:
+        json_data = json.load(f)
+
+        for obj in json_data:
+            slash_priors[obj['name']] = {'/': obj['forward'], '\\': obj['backward']}
+
+        return slash_priors
+
+
+def write_slash_priors(path, slash_priors):
+    json_data = []
+    for name in sorted(slash_priors):
+        json_data.append({
+            'name': name,
+            'forward': slash_priors[name]['/'],
+            'backward': slash_priors[name]['\\'],
+        })
+
+    with open(path, 'w') as f:
+        json.dump(json_data, f, indent=2)
+        f.write('\n')
+
+
+# slash counts of the treebank, or of its language if the treebank is not in the table; None if neither is
+def lookup_slash_prior(slash_priors, treebank_name):
+    if treebank_name in slash_priors:
+        return slash_priors[treebank_name]
+
+    lang = treebank_name.split('_')[0]
+    if lang in slash_priors:
+        return slash_priors[lang]
+
+    return None
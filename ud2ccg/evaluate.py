@@ -1,5 +1,5 @@
 from typing import List
-from ud2ccg.cat import Category, Functor
+from ud2ccg.cat import Category, Functor, Index, TokenIndex
 from ud2ccg.parser.tree import Token
 
 
@@ -7,16 +7,18 @@ from ud2ccg.parser.tree import Token
 # - i = token index of head
 # - j = token index of dependent
 def extract_pas(tokens: List[Token], supertags: List[Category]):
-    # create a map of head index -> token index (position in sentence)
+    # create a map of head index (value of Index) -> token index (position in sentence);
+    # token index references (TokenIndex) need no map
     hidx_to_tidx_map = dict()
     modifiers = list()
 
     for i, supertag in enumerate(supertags, 1):
         if supertag is not None:
-            supertag_hidx = str(supertag.index)
-            if supertag_hidx not in hidx_to_tidx_map:
-                hidx_to_tidx_map[supertag_hidx] = list()
-            hidx_to_tidx_map[supertag_hidx].append(i)
+            if isinstance(supertag.index, Index):
+                supertag_hidx = supertag.index.value
+                if supertag_hidx not in hidx_to_tidx_map:
+                    hidx_to_tidx_map[supertag_hidx] = list()
+                hidx_to_tidx_map[supertag_hidx].append(i)
 
             # if category is of the form (X_i|X_i)_j, we consider this a modifier-type category
             if isinstance(supertag, Functor):
@@ -41,15 +43,13 @@ def extract_pas(tokens: List[Token], supertags: List[Category]):
 
             # map head index of argument to its position (token index) in the sentence
             for argument in arguments:
-                argument_hidx = str(argument.index)
+                argument_hidx = argument.index
 
                 argument_tidx = None
-                if ':t' in argument_hidx:
-                    if argument_hidx[:-2] != 'None':
-                        argument_tidx = [int(argument_hidx[:-2])]
-                else:
-                    if argument_hidx in hidx_to_tidx_map:
-                        argument_tidx = hidx_to_tidx_map[argument_hidx]
+                if isinstance(argument_hidx, TokenIndex):
+                    argument_tidx = [argument_hidx.pos]
+                elif isinstance(argument_hidx, Index):
+                    argument_tidx = hidx_to_tidx_map.get(argument_hidx.value)
 
                 # argument_tidx can be a list because of rules for coordination;
                 # conjuncts can have the same index
@@ -57,18 +57,13 @@ def extract_pas(tokens: List[Token], supertags: List[Category]):
                     for j in argument_tidx:
                         # check if this dependency between i and j is valid;
                         # need to prevent crossing dependency between two conjuncts
-                        # TODO there may be a better way to do this
+                        # of the same coordination
                         is_valid = True
-                        i_feat = tokens[i-1].feat
-                        j_feat = tokens[j-1].feat
-                        if ':' in i_feat and ':' in j_feat:
-                            i_common_conj_idx = i_feat.split(':')[0]
-                            j_common_conj_idx = j_feat.split(':')[0]
-                            if i_common_conj_idx == j_common_conj_idx:
-                                i_conj_idx = i_feat.split(':')[1]
-                                j_conj_idx = j_feat.split(':')[1]
-                                if i_conj_idx != j_conj_idx:
-                                    is_valid = False
+                        i_tok = tokens[i-1]
+                        j_tok = tokens[j-1]
+                        if i_tok.conj_group != 0 and i_tok.conj_group == j_tok.conj_group:
+                            if i_tok.conjunct != j_tok.conjunct:
+                                is_valid = False
 
                         # flip direction of dependency projected from modifiers
                         if is_valid:
@@ -89,7 +84,7 @@ def extract_pas_from_conllup(up_sentences):
     for sent_id in up_sentences:
         pas = list()
 
-        for up_token in up_sentences[sent_id]:
+        for up_token in up_sentences[sent_id].sentence:
             pred_idx = up_token.idx
             argheads = up_token.argheads
 
@@ -116,7 +111,7 @@ def extract_pas_from_conllup_with_span(up_sentences):
     for sent_id in up_sentences:
         pas = list()
 
-        for up_token in up_sentences[sent_id]:
+        for up_token in up_sentences[sent_id].sentence:
             pred_idx = up_token.idx
             argspans = up_token.argspans
 
@@ -138,7 +133,8 @@ def extract_pas_from_conllup_with_span(up_sentences):
     return all_pas
 
 
-# span-based evaluation
+# span-based evaluation;
+# conversion_results maps sent_id to the PAS extracted from the conversion result (see extract_pas())
 def evaluate_against_up_with_span(conversion_results, up_sentences):
     # extract PAS from UP data
     all_up_pas = extract_pas_from_conllup_with_span(up_sentences)
@@ -156,11 +152,8 @@ def evaluate_against_up_with_span(conversion_results, up_sentences):
 
     # loop
     for sent_id in conversion_results:
-        conversion_result = conversion_results[sent_id]
-        toks, tags = conversion_result
-
-        # extract PAS from conversion result
-        result_pas = extract_pas(toks, tags)
+        # PAS of conversion result
+        result_pas = conversion_results[sent_id]
 
         # UP's PAS of this sentence
         up_pas = all_up_pas[sent_id]
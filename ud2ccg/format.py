@@ -44,7 +44,8 @@ class Node:
             return '({})'.format(self.description)
 
 
-def to_auto(btree, dtree, debug=False):
+# the derivation as a tree of Node objects (see to_auto())
+def _to_auto_nodes(btree, dtree, debug=False):
     def _traverse(btree_root, expand_tc=True):
         btree_root_node = btree.get_btree_node(btree_root)
 
@@ -122,3 +123,98 @@ def to_auto(btree, dtree, debug=False):
     auto_root = _traverse(btree.get_root())
 
     return auto_root
+
+
+# flags of a node in the shape of a derivation (see write_auto()),
+# added to its number of children (0, 1 or 2)
+SHAPE_HEAD_RIGHT = 4    # the head is the right child of a binary node
+SHAPE_TYPE_CHANGE = 8   # a unary node of a type-changing rule (category_tc)
+
+
+# append the derivation in .auto format to out, a list of strings, in a single iterative walk of the btree;
+# gives the same string as the Node tree of _to_auto_nodes(), without building it.
+# if shape is given (a list), the shape of each node (see SHAPE_HEAD_RIGHT) is appended to it,
+# in the order the nodes are written
+def write_auto(btree, dtree, out, debug=False, shape=None):
+    # items still to write: a string, or a (btree node, expand_tc) pair to visit
+    stack = [(btree.get_root(), True)]
+
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            out.append(item)
+            continue
+
+        btree_root, expand_tc = item
+        btree_root_node = btree.get_btree_node(btree_root)
+        category = btree_root_node['category']
+
+        if category is None:
+            btree_root_cat = '?'
+            btree_root_pred_arg_cat = '?'
+        else:
+            btree_root_cat = str(category)
+            btree_root_pred_arg_cat = category.to_str()
+
+            if not btree_root_cat.strip():
+                btree_root_cat = '?'
+
+            if not btree_root_pred_arg_cat.strip():
+                btree_root_pred_arg_cat = '?'
+
+            # handle type-changing rule: a unary node above the node itself
+            if expand_tc and 'category_tc' in btree_root_node:
+                category_tc = btree_root_node['category_tc']
+                out.append(f'(<T {category_tc.to_str() if debug else category_tc} 0 1> ')
+                if shape is not None:
+                    shape.append(1 + SHAPE_TYPE_CHANGE)
+                stack.append(' )')
+                stack.append((btree_root, False))
+                continue
+
+        if debug:
+            btree_root_cat = btree_root_pred_arg_cat
+
+        children = btree.get_children(btree_root)
+
+        if children:
+            if len(children) == 2:
+                if btree.get_idx(children[0]) < btree.get_idx(children[1]):
+                    head_child_idx = 0
+                    left_child = children[0]
+                    right_child = children[1]
+                else:
+                    head_child_idx = 1
+                    left_child = children[1]
+                    right_child = children[0]
+
+                out.append(f'(<T {btree_root_cat} {head_child_idx} 2> ')
+                if shape is not None:
+                    shape.append(2 + SHAPE_HEAD_RIGHT * head_child_idx)
+                stack.append(' )')
+                stack.append((right_child, True))
+                stack.append(' ')
+                stack.append((left_child, True))
+            else:
+                # if there is only one child
+                out.append(f'(<T {btree_root_cat} 0 1> ')
+                if shape is not None:
+                    shape.append(1)
+                stack.append(' )')
+                stack.append((children[0], True))
+        else:
+            pos = dtree.get_pos(btree_root_node['idx'])
+            word = dtree.get_form(btree_root_node['idx']).strip().replace(' ', '_')
+            out.append(f'(<L {btree_root_cat} {pos} {pos} {word} {btree_root_pred_arg_cat}>)')
+            if shape is not None:
+                shape.append(0)
+
+
+# the derivation in .auto format; with nodes, the tree of Node objects instead (whose str() is the same string)
+def to_auto(btree, dtree, debug=False, nodes=False):
+    if nodes:
+        return _to_auto_nodes(btree, dtree, debug)
+
+    out = list()
+    write_auto(btree, dtree, out, debug)
+    return ''.join(out)
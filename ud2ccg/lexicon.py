@@ -0,0 +1,128 @@
+import os
+import heapq
+import logging
+import tempfile
+from ud2ccg.writer import atomic_open
+
+
+logger = logging.getLogger(__name__)
+
+# at most this many runs are merged at once; more runs are merged in several rounds
+MAX_FAN_IN = 128
+
+
+# path of the lexicon run written by convert_conllu(), merged into lexicons over many files by merge_lexicons()
+def get_lexicon_run_path(conllu_path, export_path):
+    filename = os.path.splitext(os.path.basename(conllu_path))[0]
+    return os.path.join(export_path, filename + ".lexrun")
+
+
+# write the lexicon of one converted file as a sorted run: one line word<TAB>category<TAB>count per lexeme,
+# sorted by (word, category); lexicon maps (word, category) to count
+def write_lexicon_run(path, lexicon):
+    with atomic_open(path, 'w') as f:
+        for word, category in sorted(lexicon):
+            f.write(f'{word}\t{category}\t{lexicon[(word, category)]}\n')
+
+
+def read_lexicon_run(path):
+    with open(path, 'r') as f:
+        for line in f:
+            word, category, count = line.rstrip('\n').split('\t')
+            yield word, category, int(count)
+
+
+# k-way merge of sorted runs, yielding (word, category, count) sorted by (word, category),
+# with the counts of the same lexeme in different runs summed up
+def merge_lexicon_runs(run_paths):
+    if len(run_paths) > MAX_FAN_IN:
+        yield from _merge_in_rounds(run_paths)
+        return
+
+    current_word, current_category, current_count = None, None, 0
+    for word, category, count in heapq.merge(*[read_lexicon_run(run_path) for run_path in run_paths]):
+        if word == current_word and category == current_category:
+            current_count += count
+        else:
+            if current_word is not None:
+                yield current_word, current_category, current_count
+            current_word, current_category, current_count = word, category, count
+
+    if current_word is not None:
+        yield current_word, current_category, current_count
+
+
+# merge groups of MAX_FAN_IN runs into temporary runs, then merge those
+def _merge_in_rounds(run_paths):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        merged_paths = list()
+        for i in range(0, len(run_paths), MAX_FAN_IN):
+            merged_path = os.path.join(tmp_dir, f'{len(merged_paths)}.lexrun')
+            with open(merged_path, 'w') as f:
+                for word, category, count in merge_lexicon_runs(run_paths[i:i + MAX_FAN_IN]):
+                    f.write(f'{word}\t{category}\t{count}\n')
+            merged_paths.append(merged_path)
+
+        yield from merge_lexicon_runs(merged_paths)
+
+
+# merge the runs into <output_prefix>.lexicon.tsv (word, category, count),
+# <output_prefix>.word-categories.tsv (word, category, count, P(category | word), most frequent category first)
+# and <output_prefix>.category-freq.tsv (category, count, relative frequency, most frequent first).
+# only the categories of one word and the category frequency table are kept in memory
+def write_merged_lexicon(run_paths, output_prefix):
+    category_counts = dict()
+    num_lexemes = 0
+    num_words = 0
+
+    with atomic_open(output_prefix + '.lexicon.tsv', 'w') as f_lex, \
+            atomic_open(output_prefix + '.word-categories.tsv', 'w') as f_dist:
+
+        def _write_distribution(word, word_categories):
+            total = sum(count for category, count in word_categories)
+            for category, count in sorted(word_categories, key=lambda item: (-item[1], item[0])):
+                f_dist.write(f'{word}\t{category}\t{count}\t{count / total:.6f}\n')
+
+        current_word = None
+        word_categories = list()
+        for word, category, count in merge_lexicon_runs(run_paths):
+            f_lex.write(f'{word}\t{category}\t{count}\n')
+            num_lexemes += 1
+
+            category_counts[category] = category_counts.get(category, 0) + count
+
+            if word != current_word:
+                if current_word is not None:
+                    _write_distribution(current_word, word_categories)
+                current_word = word
+                word_categories = list()
+                num_words += 1
+            word_categories.append((category, count))
+
+        if current_word is not None:
+            _write_distribution(current_word, word_categories)
+
+    total = sum(category_counts.values())
+    with atomic_open(output_prefix + '.category-freq.tsv', 'w') as f_freq:
+        for category in sorted(category_counts, key=lambda category: (-category_counts[category], category)):
+            f_freq.write(f'{category}\t{category_counts[category]}\t{category_counts[category] / total:.6f}\n')
+
+    logger.info(f"Merged {len(run_paths)} lexicons into {output_prefix}: "
+                f"{num_words} words, {len(category_counts)} categories, {num_lexemes} lexemes")
+
+
+# merge the lexicon runs of all files into a global lexicon and one lexicon per language;
+# runs is a list of (language, run path), missing runs are ignored
+def merge_lexicons(runs, output_dir):
+    os.makedirs(output_dir, exist_ok=True)
+
+    runs_by_lang = dict()
+    for lang, run_path in runs:
+        if os.path.isfile(run_path):
+            runs_by_lang.setdefault(lang, list()).append(run_path)
+
+    all_run_paths = [run_path for lang in sorted(runs_by_lang) for run_path in runs_by_lang[lang]]
+    write_merged_lexicon(all_run_paths, os.path.join(output_dir, 'all'))
+
+    for lang in sorted(runs_by_lang):
+        write_merged_lexicon(runs_by_lang[lang], os.path.join(output_dir, lang))
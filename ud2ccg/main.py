@@ -1,12 +1,17 @@
 import os
 import sys
+import time
 import logging
-from pathlib import Path
 from ud2ccg.argparse import parse_args
-from ud2ccg.transform import convert_conllu
-from ud2ccg.utils import check_valid_treebank
-
-logging.basicConfig(format="%(asctime)s - %(levelname)s - %(name)s - %(message)s", level=logging.INFO)
+from ud2ccg.transform import choose_default_slash
+from ud2ccg.config.config import read_slash_priors, write_slash_priors, lookup_slash_prior
+from ud2ccg.scheduler import LOG_FORMAT, make_job, discover_jobs, run_jobs, log_summary
+from ud2ccg.manifest import OutputManifest
+from ud2ccg.metrics import get_metrics_path, rollup_metrics, write_metrics, log_metrics
+from ud2ccg.lexicon import get_lexicon_run_path, merge_lexicons
+from ud2ccg.api import convert_stream
+
+logging.basicConfig(format=LOG_FORMAT, level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
@@ -19,13 +24,41 @@ def main(args):
     sud_conllu_path = args.sud_conllu_path
     up_conllup_path = args.up_conllup_path
 
+    # convert sentences from stdin to stdout, with no files involved
+    if args.stdin:
+        convert_stdin(args)
+        return
+
     if (ud_path is None and conllu_path is None) or (ud_path is not None and conllu_path is not None):
         logger.error("Please verify path to UD directory or .conllu file")
         sys.exit(1)
 
     export_path = args.export_path
+    if export_path is None:
+        logger.error("Please give an export path")
+        sys.exit(1)
     convert_crossing_dependencies = args.convert_crossing_dependencies
     complete_output_only = args.complete_output_only
+    profile_rules = args.profile_rules
+    incremental = args.incremental
+    num_workers = args.num_workers
+    batch_size = args.batch_size
+    low_memory = args.low_memory
+    slash_priors_path = args.slash_priors_path
+    slash_priors_from_train = args.slash_priors_from_train
+    export_slash_priors_path = args.export_slash_priors_path
+    compress_output = args.compress_output
+    export_binary = args.export_binary
+    num_jobs = args.num_jobs
+    force = args.force
+    max_height = args.max_height
+    max_nodes = args.max_nodes
+    max_categories = args.max_categories
+    max_time = args.max_time
+    dedup_cache_size = args.dedup_cache_size
+    result_store_path = args.result_store_path
+    result_store_size = args.result_store_size
+    merge_lexicons_opt = args.merge_lexicons
     debug = args.debug
 
     if ud_path is not None:
@@ -35,68 +68,156 @@ def main(args):
     logger.info(f"Export path: {export_path}")
     logger.info(f"Convert trees with crossing dependencies: {convert_crossing_dependencies}")
     logger.info(f"Only export fully converted trees: {complete_output_only}")
+    logger.info(f"Profile rules: {profile_rules}")
+    logger.info(f"Incremental conversion: {incremental}")
+    logger.info(f"Number of workers: {num_workers}")
+    logger.info(f"Number of concurrent files: {num_jobs}")
+    logger.info(f"Low-memory mode: {low_memory}")
+    logger.info(f"Slash priors: {slash_priors_path}")
+    logger.info(f"Slash priors from train split: {slash_priors_from_train}")
+    logger.info(f"Compress output: {compress_output}")
+    logger.info(f"Export packed derivations: {export_binary}")
+    logger.info(f"Reconvert up-to-date outputs: {force}")
+    logger.info(f"Sentence budget: height {max_height}, nodes {max_nodes}, "
+                f"categories {max_categories}, time {max_time}")
+    logger.info(f"Dedup cache size: {dedup_cache_size}")
+    logger.info(f"Result store: {result_store_path} (max. {result_store_size} MB)")
+    logger.info(f"Merge lexicons: {merge_lexicons_opt}")
     logger.info(f"Debug mode: {debug}")
 
+    # slash-direction priors, keyed by treebank name or language code (optional)
+    slash_priors = dict()
+    if slash_priors_path is not None:
+        slash_priors = read_slash_priors(slash_priors_path)
+
+    # slash counts of the converted files, summed per treebank and per language
+    observed_slash_priors = dict()
+
+    # default slash direction of a treebank from the prior table, or from its train split if given;
+    # None if it has to be determined from the file itself
+    def get_default_slash(treebank_name, train_slash_stats=None):
+        slash_prior = lookup_slash_prior(slash_priors, treebank_name)
+        if slash_prior is None:
+            slash_prior = train_slash_stats
+        if slash_prior is None:
+            return None
+        return choose_default_slash(slash_prior)
+
+    def add_observed_slash_stats(treebank_name, slash_stats):
+        lang = treebank_name.split('_')[0]
+        for name in {treebank_name, lang}:
+            if name not in observed_slash_priors:
+                observed_slash_priors[name] = {'/': 0, '\\': 0}
+            observed_slash_priors[name]['/'] += slash_stats['/']
+            observed_slash_priors[name]['\\'] += slash_stats['\\']
+
+    start = time.perf_counter()
+
     # if given a conllu file instead of a folder
     if conllu_path is not None:
-        convert_conllu(conllu_path,
-                       export_path,
-                       sud_conllu_path,
-                       up_conllup_path,
-                       convert_crossing_dependencies,
-                       complete_output_only)
+        jobs = [make_job(conllu_path, export_path, sud_conllu_path, up_conllup_path)]
 
     # if given a folder instead of a conllu file
     if ud_path is not None:
-        num_treebanks = 0
-        num_valid_treebanks = 0
-
-        for root, subdirs, files in sorted(os.walk(ud_path)):
-            if 'UD_' in os.path.basename(root):
-                num_treebanks += 1
-                is_valid = check_valid_treebank(root, check_data_splits_opt=False)
-
-                if is_valid:
-                    num_valid_treebanks += 1
-                    dirpath, dirname = os.path.split(root)
-                    dirname_parts = dirname[3:].split('-')
-                    lang = dirname_parts[0]
-                    treebank = dirname_parts[1]
-
-                    converted_path = os.path.join(export_path, dirname)
-                    Path(converted_path).mkdir(parents=True, exist_ok=True)
-
-                    for file in files:
-                        if file.endswith('.conllu'):
-                            filename = os.path.splitext(file)[0]
-                            filename_parts = filename.split('-')
-                            treebank_name = filename_parts[0]
-                            split = filename_parts[2]
-
-                            conllu_path = os.path.join(root, file)
-
-                            # get corresponding UP path
-                            if up_path is not None:
-                                up_treebank_dir = 'UP_' + lang + '-' + treebank
-                                up_treebank_file = '-'.join([treebank_name, 'up', split]) + '.conllup'
-                                up_conllup_path = os.path.join(up_path, up_treebank_dir, up_treebank_file)
-                                if not os.path.isfile(up_conllup_path):
-                                    up_conllup_path = None
-
-                            # get corresponding SUD path
-                            if sud_path is not None:
-                                sud_treebank_dir = 'SUD_' + lang + '-' + treebank
-                                sud_treebank_file = '-'.join([treebank_name, 'sud', split]) + '.conllu'
-                                sud_conllu_path = os.path.join(sud_path, sud_treebank_dir, sud_treebank_file)
-                                if not os.path.isfile(sud_conllu_path):
-                                    sud_conllu_path = None
-
-                            convert_conllu(conllu_path,
-                                           converted_path,
-                                           sud_conllu_path,
-                                           up_conllup_path,
-                                           convert_crossing_dependencies,
-                                           complete_output_only)
+        jobs = discover_jobs(ud_path, export_path, up_path, sud_path)
+
+    options = dict(convert_crossing_dependencies=convert_crossing_dependencies,
+                   complete_output_only=complete_output_only,
+                   profile_rules=profile_rules,
+                   incremental=incremental,
+                   num_workers=num_workers,
+                   batch_size=batch_size,
+                   low_memory=low_memory,
+                   compress_output=compress_output,
+                   export_binary=export_binary,
+                   max_height=max_height,
+                   max_nodes=max_nodes,
+                   max_categories=max_categories,
+                   max_time=max_time,
+                   dedup_cache_size=dedup_cache_size,
+                   result_store_path=result_store_path,
+                   result_store_size=result_store_size << 20)
+
+    # outputs already in export_path, skipped if their inputs, options and the converter have not changed
+    manifest = OutputManifest(export_path)
+
+    results = run_jobs(jobs, options, get_default_slash, num_jobs, slash_priors_from_train, manifest, force)
+
+    for job in jobs:
+        slash_stats = results[job.conllu_path][1]
+        if slash_stats is not None:
+            add_observed_slash_stats(job.treebank_name, slash_stats)
+
+    wall_time = time.perf_counter() - start
+    log_summary(results, wall_time)
+
+    # roll up the metrics of all files (including files skipped as up to date)
+    rollup = rollup_metrics([get_metrics_path(job.conllu_path, job.export_path) for job in jobs])
+    rollup['run_wall_time'] = wall_time
+    rollup_path = os.path.join(export_path, 'metrics.json')
+    write_metrics(rollup_path, rollup)
+
+    logger.info(f"Stage times and throughput of {rollup['files']} files (written to {rollup_path}):")
+    log_metrics(rollup)
+
+    # hit rate of the dedup cache per treebank
+    if dedup_cache_size > 0:
+        logger.info("Duplicate sentences taken from the dedup cache:")
+        for treebank_name in sorted({job.treebank_name for job in jobs}):
+            treebank_rollup = rollup_metrics([get_metrics_path(job.conllu_path, job.export_path)
+                                              for job in jobs if job.treebank_name == treebank_name])
+            num_sentences = treebank_rollup['sentences']
+            hit_rate = treebank_rollup['dedup_hits'] / num_sentences if num_sentences > 0 else 0.0
+            logger.info(f"  {treebank_name:<17}: {treebank_rollup['dedup_hits']}/{num_sentences} ({hit_rate:.1%})")
+
+    # merge the lexicons of all files (including files skipped as up to date), globally and per language
+    if merge_lexicons_opt:
+        lexicon_path = os.path.join(export_path, 'lexicon')
+        merge_lexicons([(job.treebank_name.split('_')[0], get_lexicon_run_path(job.conllu_path, job.export_path))
+                        for job in jobs], lexicon_path)
+        logger.info(f"Merged lexicons written to {lexicon_path}")
+
+    # write slash-direction priors to file
+    if export_slash_priors_path is not None:
+        write_slash_priors(export_slash_priors_path, observed_slash_priors)
+        logger.info(f"Slash priors written to {export_slash_priors_path}")
+
+    # some files could not be converted (see summary)
+    if any(status == 'failed' for status, slash_stats, wall_time in results.values()):
+        sys.exit(1)
+
+
+# the --stdin mode of main(): the log goes to stderr, the converted sentences to stdout
+def convert_stdin(args):
+    logger.info("Input: stdin")
+    logger.info(f"Output format: {args.output_format}")
+    logger.info(f"Default slash direction: {args.default_slash}")
+
+    f_up = open(args.up_conllup_path, 'r') if args.up_conllup_path is not None else None
+    f_sud = open(args.sud_conllu_path, 'r') if args.sud_conllu_path is not None else None
+
+    try:
+        num_read, num_written = convert_stream(sys.stdin,
+                                               sys.stdout,
+                                               args.output_format,
+                                               f_up,
+                                               f_sud,
+                                               complete_output_only=args.complete_output_only,
+                                               default_slash=args.default_slash,
+                                               convert_crossing_dependencies=args.convert_crossing_dependencies,
+                                               max_height=args.max_height,
+                                               max_nodes=args.max_nodes,
+                                               max_categories=args.max_categories,
+                                               max_time=args.max_time)
+    except BrokenPipeError:
+        # the next process in the pipeline stopped reading (e.g. head); exit without flushing stdout again
+        os._exit(0)
+    finally:
+        for f in [f_up, f_sud]:
+            if f is not None:
+                f.close()
+
+    logger.info(f"Sentences converted: {num_written}/{num_read}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,82 @@
+import os
+import json
+import hashlib
+import logging
+from ud2ccg.provenance import converter_version
+from ud2ccg.writer import atomic_open
+
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'manifest.json'
+
+
+def file_digest(path):
+    if path is None:
+        return None
+
+    sha = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# manifest of the outputs in an export path, for resuming and repeating runs;
+# for each converted .conllu file (keyed by the path of its .auto file, relative to the export path),
+# it records the hashes of the UD, SUD and UP inputs, the converter version, the options the output depends on,
+# the output files and the slash stats of the conversion.
+# the manifest is rewritten (atomically) every time an entry is updated
+class OutputManifest:
+    def __init__(self, export_path):
+        self.export_path = export_path
+        self.path = os.path.join(export_path, MANIFEST_FILENAME)
+        self.version = converter_version()
+        self.entries = dict()
+
+        if os.path.isfile(self.path):
+            with open(self.path, 'r') as f:
+                self.entries = json.load(f)
+
+    def _key(self, output_path):
+        return os.path.relpath(output_path, self.export_path)
+
+    # the entry an up-to-date output of these inputs and options would have (without slash stats)
+    def make_entry(self, output_paths, conllu_path, sud_conllu_path=None, up_conllup_path=None, options=None):
+        return {
+            'inputs': {
+                'ud': file_digest(conllu_path),
+                'sud': file_digest(sud_conllu_path),
+                'up': file_digest(up_conllup_path),
+            },
+            'converter': self.version,
+            'options': options if options is not None else {},
+            'outputs': [self._key(output_path) for output_path in output_paths],
+        }
+
+    # return the recorded entry if it matches the given one and all its outputs exist, else None
+    def lookup(self, entry):
+        recorded = self.entries.get(entry['outputs'][0])
+        if recorded is None:
+            return None
+
+        for field in ['inputs', 'converter', 'options', 'outputs']:
+            if recorded.get(field) != entry[field]:
+                return None
+
+        for output in recorded['outputs']:
+            if not os.path.isfile(os.path.join(self.export_path, output)):
+                return None
+
+        return recorded
+
+    def update(self, entry, slash_stats):
+        entry = dict(entry)
+        entry['slash_stats'] = slash_stats
+        self.entries[entry['outputs'][0]] = entry
+        self.save()
+
+    def save(self):
+        with atomic_open(self.path, 'w') as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+            f.write('\n')
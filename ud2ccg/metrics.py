@@ -0,0 +1,131 @@
+import os
+import json
+import time
+import logging
+from ud2ccg.writer import atomic_open
+
+
+logger = logging.getLogger(__name__)
+
+# stages of the conversion pipeline, in the order they are reported
+STAGES = [
+    'read_ud',
+    'read_sud',
+    'read_up',
+    'preprocess',
+    'binarize',
+    'rules',
+    'postprocess',
+    'traverse_category',
+    'fixups',
+    'to_auto',
+    'write',
+    'evaluate',
+]
+
+
+# total time and number of calls of each stage of the pipeline
+class StageTimer:
+    def __init__(self):
+        self.stages = dict()   # stage name -> [total time, calls]
+
+    def add(self, name, elapsed, calls=1):
+        if name not in self.stages:
+            self.stages[name] = [0.0, 0]
+        self.stages[name][0] += elapsed
+        self.stages[name][1] += calls
+
+    # a clock whose laps are added to this timer (see StageClock)
+    def clock(self):
+        return StageClock(self)
+
+    def merge(self, other):
+        for name, (elapsed, calls) in other.stages.items():
+            if name not in self.stages:
+                self.stages[name] = [0.0, 0]
+            self.stages[name][0] += elapsed
+            self.stages[name][1] += calls
+
+    def to_dict(self):
+        names = [name for name in STAGES if name in self.stages]
+        names += sorted(name for name in self.stages if name not in STAGES)
+        return {name: {'time': self.stages[name][0], 'calls': self.stages[name][1]} for name in names}
+
+
+# times consecutive stages: lap(name) adds the time since the previous lap (or since the clock was created)
+# to stage name of the timer; use calls=0 when continuing a stage that was interrupted by another one
+class StageClock:
+    def __init__(self, timer):
+        self.timer = timer
+        self.last = time.perf_counter()
+
+    def lap(self, name, calls=1):
+        now = time.perf_counter()
+        self.timer.add(name, now - self.last, calls)
+        self.last = now
+
+
+# path of the metrics file written by convert_conllu()
+def get_metrics_path(conllu_path, export_path):
+    filename = os.path.splitext(os.path.basename(conllu_path))[0]
+    return os.path.join(export_path, filename + ".metrics.json")
+
+
+# metrics of the conversion of one file
+def make_metrics(conllu_path, timer, wall_time, num_sentences, num_tokens, num_converted, num_quarantined,
+                 num_dedup_hits=0):
+    return {
+        'file': conllu_path,
+        'wall_time': wall_time,
+        'sentences': num_sentences,
+        'tokens': num_tokens,
+        'converted': num_converted,
+        'quarantined': num_quarantined,
+        'dedup_hits': num_dedup_hits,
+        'sentences_per_second': num_sentences / wall_time if wall_time > 0 else 0.0,
+        'tokens_per_second': num_tokens / wall_time if wall_time > 0 else 0.0,
+        'stages': timer.to_dict(),
+    }
+
+
+def write_metrics(path, metrics):
+    with atomic_open(path, 'w') as f:
+        json.dump(metrics, f, indent=2)
+        f.write('\n')
+
+
+# sum the metrics files of many converted files; missing files are ignored.
+# throughput is given per second of conversion time, i.e. the sum of the wall times of the files,
+# which is more than the wall time of the whole run when files are converted concurrently
+def rollup_metrics(metrics_paths):
+    timer = StageTimer()
+    rollup = {'files': 0, 'wall_time': 0.0, 'sentences': 0, 'tokens': 0, 'converted': 0, 'quarantined': 0,
+              'dedup_hits': 0}
+
+    for metrics_path in metrics_paths:
+        if not os.path.isfile(metrics_path):
+            continue
+
+        with open(metrics_path, 'r') as f:
+            metrics = json.load(f)
+
+        rollup['files'] += 1
+        for key in ['wall_time', 'sentences', 'tokens', 'converted', 'quarantined']:
+            rollup[key] += metrics[key]
+        rollup['dedup_hits'] += metrics.get('dedup_hits', 0)
+        for name, stage in metrics['stages'].items():
+            timer.add(name, stage['time'], stage['calls'])
+
+    wall_time = rollup['wall_time']
+    rollup['sentences_per_second'] = rollup['sentences'] / wall_time if wall_time > 0 else 0.0
+    rollup['tokens_per_second'] = rollup['tokens'] / wall_time if wall_time > 0 else 0.0
+    rollup['stages'] = timer.to_dict()
+
+    return rollup
+
+
+def log_metrics(metrics):
+    logger.info(f"  Sentences        : {metrics['sentences']} ({metrics['sentences_per_second']:.1f}/s)")
+    logger.info(f"  Tokens           : {metrics['tokens']} ({metrics['tokens_per_second']:.1f}/s)")
+    for name, stage in metrics['stages'].items():
+        logger.info(f"  {name:<17}: {stage['time']:.3f}s ({stage['calls']} calls)")
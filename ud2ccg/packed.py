@@ -0,0 +1,209 @@
+import os
+import sys
+import json
+import mmap
+import struct
+from array import array
+from collections import namedtuple
+from ud2ccg.format import SHAPE_HEAD_RIGHT, SHAPE_TYPE_CHANGE
+
+
+# packed derivations of a converted file (.deriv), for training jobs that would otherwise parse the .auto file
+# every time. the layout is (all numbers little-endian):
+# - HEADER: magic, format version, number of sentences, offset of the sentence table,
+#   offset and length of the vocabulary
+# - one record per sentence, starting at a multiple of 4 bytes:
+#   - int32 word id of each token
+#   - int32 supertag id of each token
+#   - int32 category id of each node of the derivation, in the order of the .auto format (preorder)
+#   - uint8 head child of each node (1 if the head is the right child of a binary node, else 0)
+#   - uint8 number of children of each node
+#   - uint8 type-change marker of each node (1 for a unary node of a type-changing rule, else 0)
+# - sentence table, starting at a multiple of 8 bytes: int64 record offset, number of tokens and number of nodes
+#   of each sentence
+# - vocabulary: a JSON object with the sent_id of each sentence, the words, and the categories
+#   (shared by the supertags and the nodes of the derivations)
+MAGIC = b'UD2CCGDV'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<8sIIQQQ')
+
+
+# path of the packed derivations written by convert_conllu() with export_binary
+def get_packed_path(conllu_path, export_path):
+    filename = os.path.splitext(os.path.basename(conllu_path))[0]
+    return os.path.join(export_path, filename + ".deriv")
+
+
+# the category of each node of a derivation in .auto format, in the order they are written;
+# the fields of a node are separated by single spaces and contain none
+def auto_categories(auto):
+    categories = list()
+    fields = auto.split(' ')
+    i = 0
+    while i < len(fields):
+        if fields[i] == '(<T':
+            categories.append(fields[i + 1])
+            i += 4
+        elif fields[i] == '(<L':
+            categories.append(fields[i + 1])
+            i += 6
+        else:
+            i += 1
+    return categories
+
+
+def _to_bytes(values, typecode):
+    values = array(typecode, values)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values.tobytes()
+
+
+# writes the derivations of CompactSentences to a .deriv file (see MAGIC for the layout).
+# the file is written to a temporary file that replaces the file at path only when closed without error
+class PackedDerivationWriter:
+    def __init__(self, path):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        self.f = open(self.tmp_path, 'wb')
+        self.f.write(bytes(HEADER.size))
+        self.offset = HEADER.size
+
+        self.table = list()   # record offset, number of tokens, number of nodes of each sentence
+        self.sent_ids = list()
+        self.words = dict()        # word -> id
+        self.categories = dict()   # category -> id
+        self.closed = False
+
+    def write(self, compact):
+        categories = auto_categories(compact.auto)
+        if len(categories) != len(compact.shape):
+            raise ValueError(f"{compact.sent_id}: {len(categories)} categories for {len(compact.shape)} nodes")
+
+        ids = [self.words.setdefault(word, len(self.words)) for word in compact.words]
+        ids += [self.categories.setdefault(tag, len(self.categories)) for tag in compact.tags]
+        ids += [self.categories.setdefault(category, len(self.categories)) for category in categories]
+
+        record = [_to_bytes(ids, 'i'),
+                  bytes(int(node & SHAPE_HEAD_RIGHT != 0) for node in compact.shape),
+                  bytes(node & 3 for node in compact.shape),
+                  bytes(int(node & SHAPE_TYPE_CHANGE != 0) for node in compact.shape)]
+        size = sum(len(data) for data in record)
+        record.append(bytes(-size % 4))
+
+        for data in record:
+            self.f.write(data)
+
+        self.table += [self.offset, len(compact.words), len(compact.shape)]
+        self.sent_ids.append(compact.sent_id)
+        self.offset += size + len(record[-1])
+
+    # with discard, the sentences written so far are thrown away and the file at path is left untouched
+    def close(self, discard=False):
+        if self.closed:
+            return
+        self.closed = True
+
+        if discard:
+            self.f.close()
+            os.remove(self.tmp_path)
+            return
+
+        try:
+            padding = bytes(-self.offset % 8)
+            self.f.write(padding)
+            table_offset = self.offset + len(padding)
+            self.f.write(_to_bytes(self.table, 'q'))
+
+            vocab_offset = table_offset + 8 * len(self.table)
+            vocab = json.dumps({'sent_ids': self.sent_ids,
+                                'words': list(self.words),
+                                'categories': list(self.categories)}, ensure_ascii=False).encode('utf-8')
+            self.f.write(vocab)
+
+            self.f.seek(0)
+            self.f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(self.sent_ids), table_offset, vocab_offset,
+                                     len(vocab)))
+        except BaseException:
+            self.f.close()
+            os.remove(self.tmp_path)
+            raise
+
+        self.f.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    # the file is only written if the with block finishes without an exception
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+
+# a sentence of a .deriv file, as NumPy arrays (see MAGIC for their meaning)
+PackedSentence = namedtuple("PackedSentence", ["sent_id", "word_ids", "supertag_ids",
+                                               "node_categories", "node_heads", "node_children",
+                                               "node_type_change"])
+
+
+# reads a .deriv file (see MAGIC for the layout); needs NumPy.
+# the file is memory-mapped, and the arrays of each sentence are views of it (no copy);
+# the mapping stays open until the reader is closed and none of the arrays are in use any more.
+# words[id] and categories[id] give the word or category of an id
+class PackedDerivationReader:
+    def __init__(self, path):
+        import numpy as np
+        self.np = np
+
+        self.f = open(path, 'rb')
+        self.buffer = mmap.mmap(self.f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, num_sentences, table_offset, vocab_offset, vocab_length = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a .deriv file of version {FORMAT_VERSION}")
+
+        self.table = np.frombuffer(self.buffer, dtype='<i8', count=3 * num_sentences,
+                                   offset=table_offset).reshape(num_sentences, 3)
+
+        vocab = json.loads(self.buffer[vocab_offset:vocab_offset + vocab_length].decode('utf-8'))
+        self.sent_ids = vocab['sent_ids']
+        self.words = vocab['words']
+        self.categories = vocab['categories']
+
+    def __len__(self):
+        return len(self.sent_ids)
+
+    def __getitem__(self, i):
+        offset, num_tokens, num_nodes = (int(value) for value in self.table[i])
+
+        num_ids = 2 * num_tokens + num_nodes
+        ids = self.np.frombuffer(self.buffer, dtype='<i4', count=num_ids, offset=offset)
+        nodes = self.np.frombuffer(self.buffer, dtype=self.np.uint8, count=3 * num_nodes, offset=offset + 4 * num_ids)
+
+        return PackedSentence(sent_id=self.sent_ids[i],
+                              word_ids=ids[:num_tokens],
+                              supertag_ids=ids[num_tokens:2 * num_tokens],
+                              node_categories=ids[2 * num_tokens:],
+                              node_heads=nodes[:num_nodes],
+                              node_children=nodes[num_nodes:2 * num_nodes],
+                              node_type_change=nodes[2 * num_nodes:])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def close(self):
+        self.table = None
+        try:
+            self.buffer.close()
+        except BufferError:
+            # arrays of some sentences are still in use; the file is unmapped once they are gone
+            pass
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
@@ -1,3 +1,105 @@
+# context of a node in the UD tree, shared by the preprocessing steps;
+# deprel is the label before preprocessing
+class NodeContext:
+    def __init__(self, head, deprel):
+        self.head = head
+        self.deprel = deprel
+        self.children = dict()   # deprel -> sorted list of children with that deprel
+        self.eud_heads = list()   # list of (head idx, eud deprel)
+        self.eud_children = list()   # list of (dependent idx, eud deprel)
+
+
+# compute the context of every node of dtree at once
+def build_node_contexts(dtree):
+    contexts = dict()
+    for node in sorted(dtree.dtree.nodes()):
+        contexts[node] = NodeContext(dtree.get_head(node), dtree.get_deprel(node))
+
+    for node in sorted(contexts):
+        context = contexts[node]
+        for child in dtree.dtree.successors(node):
+            deprel = contexts[child].deprel
+            if deprel not in context.children:
+                context.children[deprel] = list()
+            context.children[deprel].append(child)
+
+        for children in context.children.values():
+            children.sort()
+
+        if node in dtree.eud_deps_to_heads:
+            context.eud_heads = dtree.eud_deps_to_heads[node]
+        if node in dtree.eud_heads_to_deps:
+            context.eud_children = dtree.eud_heads_to_deps[node]
+
+    return contexts
+
+
+# all preprocessing steps in a single pass over the nodes of dtree;
+# gives the same result as calling preprocess_ap(), preprocess_conj() and preprocess_ref() in this order
+def preprocess(dtree, up_sentence=None):
+    contexts = build_node_contexts(dtree)
+
+    # obl-ap and conj-sent relabeling only look at deprels before preprocessing,
+    # so they can be applied to a node at any point of the pass
+    relabeled = set()
+
+    def _relabel(node):
+        if node in relabeled:
+            return
+        relabeled.add(node)
+
+        context = contexts[node]
+
+        # same as preprocess_ap()
+        if context.deprel in ['obl', 'nmod']:
+            if up_sentence is not None and 'case' in context.children:
+                if (context.head, node) in up_sentence.core_arguments:
+                    dtree.set_deprel(node, 'obl-ap')
+
+        # same as preprocess_conj()
+        elif context.deprel in ['conj']:
+            to_convert = False
+
+            head_nsubjs = contexts[context.head].children.get('nsubj')
+            if head_nsubjs:
+                nsubj_of_head = head_nsubjs[0]
+
+                if 'nsubj' in context.children:
+                    to_convert = True
+                elif len(context.eud_children) > 0:
+                    to_convert = True
+                    for eud_dep in context.eud_children:
+                        if eud_dep[0] == nsubj_of_head:
+                            to_convert = False
+                else:
+                    to_convert = True
+
+            if to_convert:
+                dtree.set_deprel(node, 'conj-sent')
+
+    for node in contexts:
+        _relabel(node)
+
+        # same as preprocess_ref(), which needs the deprels after obl-ap and conj-sent relabeling
+        is_ref = False
+        for node_eud_head in contexts[node].eud_heads:
+            if node_eud_head[1] == 'ref':
+                is_ref = True
+
+        if is_ref:
+            deprel = dtree.get_deprel(node)
+            dtree.set_deprel(node, 'ref-' + deprel)
+
+            if deprel in ['nmod']:
+                head = contexts[node].head
+                _relabel(head)
+                dtree.set_deprel(head, 'ref-' + dtree.get_deprel(head))
+
+
+# the preprocessing steps as separate passes over the nodes, the reference preprocess() is checked against
+# by scripts/check_preprocess.py
+
+
 # identify coordination between sentences (conj-sent)
 # change conj to conj-sent if:
 # - both the head of the dependent of conj have its own subject, or
@@ -75,26 +177,12 @@ def preprocess_ap(dtree, up_sentence):
             if node_children and len(node_children) > 0:
                 has_case = True
 
-            # check in up_sentence if there is an argument dependency
+            # check in up_sentence if there is a core argument dependency
             # from ud_head to node
             to_change_label = False
             if has_case:
-                for up_token in up_sentence:
-                    pred_idx = up_token.idx
-                    argheads = up_token.argheads
-
-                    if pred_idx == ud_head:
-                        if argheads != "_":
-                            parts = argheads.split("|")
-                            for part in parts:
-                                first_colon_idx = part.index(":")
-                                label = part[:first_colon_idx]
-                                arg_idx = int(part[first_colon_idx + 1:])
-
-                                if arg_idx == node:
-                                    if label in ['A0', 'A1', 'A2', 'A3', 'A4',
-                                                 'ARG0', 'ARG1', 'ARG2', 'ARG3', 'ARG4']:
-                                        to_change_label = True
+                if (ud_head, node) in up_sentence.core_arguments:
+                    to_change_label = True
 
             if to_change_label:
                 dtree.set_deprel(node, "obl-ap")
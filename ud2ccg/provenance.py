@@ -0,0 +1,315 @@
+import os
+import time
+import types
+import pickle
+import sqlite3
+import hashlib
+import logging
+from collections import OrderedDict
+from ud2ccg.rules import rules
+from ud2ccg.rules.apply import RULES
+from ud2ccg.writer import atomic_open
+
+
+logger = logging.getLogger(__name__)
+
+package_dir = os.path.dirname(os.path.abspath(__file__))
+
+# source files every rule depends on; a change to any of them invalidates all cached results.
+# rules/rules.py is not listed here, as each rule function is fingerprinted on its own
+core_files = [
+    'btree.py',
+    'cat.py',
+    'ccg_rules.py',
+    'dtree.py',
+    'preprocessing.py',
+    'reader.py',
+    'transform.py',
+    'unification.py',
+    'parser/tree.py',
+    'rules/apply.py',
+    'config/ud2-obliqueness-hierarchy.json',
+]
+
+
+def _digest_code(code, sha):
+    sha.update(code.co_code)
+    sha.update(repr(code.co_names).encode())
+    for const in code.co_consts:
+        if isinstance(const, types.CodeType):
+            _digest_code(const, sha)
+        else:
+            sha.update(repr(const).encode())
+
+
+# fingerprint of the rest of the converter (see core_files)
+def core_fingerprint():
+    sha = hashlib.sha1()
+    for core_file in core_files:
+        sha.update(core_file.encode())
+        with open(os.path.join(package_dir, core_file), 'rb') as f:
+            sha.update(f.read())
+    return sha.hexdigest()
+
+
+# fingerprint of a rule function in rules.py: its bytecode, plus the bytecode of other
+# functions and the values of config flags (e.g. APPLY_COINDEXATION) of rules.py it refers to
+def rule_fingerprint(rule):
+    sha = hashlib.sha1()
+    visited = set()
+
+    def _digest(func):
+        visited.add(func.__name__)
+        sha.update(func.__name__.encode())
+        _digest_code(func.__code__, sha)
+
+        for name in func.__code__.co_names:
+            if name in visited or name not in rules.__dict__:
+                continue
+            value = rules.__dict__[name]
+            if isinstance(value, types.FunctionType) and value.__module__ == rules.__name__:
+                _digest(value)
+            elif isinstance(value, (bool, int, float, str, list, tuple, dict)):
+                visited.add(name)
+                sha.update(f'{name}={value!r}'.encode())
+
+    _digest(rule)
+
+    return sha.hexdigest()
+
+
+# fingerprint of the whole converter: every source and config file of the package
+def converter_version():
+    sha = hashlib.sha1()
+    for root, subdirs, files in sorted(os.walk(package_dir)):
+        subdirs.sort()
+        for file in sorted(files):
+            if file.endswith('.py') or file.endswith('.json'):
+                path = os.path.join(root, file)
+                sha.update(os.path.relpath(path, package_dir).encode())
+                with open(path, 'rb') as f:
+                    sha.update(f.read())
+    return sha.hexdigest()
+
+
+# fingerprints of all rule functions, keyed by function name
+def rule_fingerprints():
+    fingerprints = dict()
+    for rule in RULES.values():
+        fingerprints[rule.__name__] = rule_fingerprint(rule)
+    return fingerprints
+
+
+# hash of all the input data of a sentence
+def sentence_signature(ud_sentence, sud_sentence=None, up_sentence=None):
+    sha = hashlib.sha1()
+
+    for token in ud_sentence.sentence:
+        sha.update(repr((token.idx, token.form, token.upos, token.feats,
+                         token.head, token.deprel, token.eud)).encode())
+
+    sha.update(b'SUD')
+    if sud_sentence is not None:
+        for token in sud_sentence:
+            sha.update(repr((token.idx, token.head, token.deprel, sorted(token.deps))).encode())
+
+    sha.update(b'UP')
+    if up_sentence is not None:
+        for token in up_sentence.sentence:
+            sha.update(repr((token.idx, token.argheads, token.argspans)).encode())
+
+    return sha.hexdigest()
+
+
+# cache of first-pass conversion results of one .conllu file, used for incremental re-conversion.
+# for each sentence it keeps the signature of its input, the names of the rule functions that fired,
+# and the pickled result of convert_single(); a cached result is reused when the input is unchanged,
+# the rest of the converter is unchanged, none of the rules that fired has changed, and the cache was written
+# with the same options (the per-sentence budget, which decides which sentences are quarantined)
+class ConversionCache:
+    def __init__(self, path, options=()):
+        self.path = path
+        self.options = tuple(options)
+        self.core = core_fingerprint()
+        self.rules = rule_fingerprints()
+        self.sentences = dict()
+        self.new_sentences = dict()
+
+        self.num_reused = 0
+        self.num_converted = 0
+
+        if os.path.isfile(path):
+            with open(path, 'rb') as f:
+                cached = pickle.load(f)
+
+            if cached['core'] != self.core:
+                logger.info("Converter changed, cached results will not be used")
+            elif cached.get('options') != self.options:
+                logger.info("Options changed, cached results will not be used")
+            else:
+                self.sentences = cached['sentences']
+
+            # rules that were added, removed or modified since the cache was written
+            self.changed_rules = set()
+            for name in set(self.rules) | set(cached['rules']):
+                if self.rules.get(name) != cached['rules'].get(name):
+                    self.changed_rules.add(name)
+            logger.info(f"Changed rules: {', '.join(sorted(self.changed_rules)) or 'none'}")
+        else:
+            self.changed_rules = set(self.rules)
+
+    # return the cached result of convert_single() for this sentence, or None if it has to be reconverted
+    def lookup(self, sent_id, signature):
+        if sent_id in self.sentences:
+            cached_signature, fired_rules, result = self.sentences[sent_id]
+            if cached_signature == signature and len(fired_rules & self.changed_rules) == 0:
+                self.new_sentences[sent_id] = self.sentences[sent_id]
+                self.num_reused += 1
+                return pickle.loads(result)
+        return None
+
+    # store the result of convert_single() for this sentence;
+    # must be called before the result is modified by the second pass
+    def store(self, sent_id, signature, result):
+        btree = result[2]
+        if btree is not None:
+            fired_rules = btree.get_fired_rules()
+        else:
+            fired_rules = frozenset()
+
+        self.new_sentences[sent_id] = (signature, fired_rules, pickle.dumps(result))
+        self.num_converted += 1
+
+    def save(self):
+        with atomic_open(self.path, 'wb') as f:
+            pickle.dump({'core': self.core,
+                         'options': self.options,
+                         'rules': self.rules,
+                         'sentences': self.new_sentences}, f)
+
+
+# in-memory cache of first-pass conversion results, for sentences whose input is the same as that of
+# a sentence converted earlier in this process (exact duplicates, in the same file or another one);
+# keyed by the signature of the input (see sentence_signature()) together with any options the result
+# depends on. results are kept pickled, so that each hit gets a fresh copy that the second pass can modify.
+# holds at most max_size results, evicting the least recently used one
+class DedupCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.results = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.results
+
+    # return a copy of the cached result of convert_single(), or None
+    def lookup(self, key):
+        result = self.results.get(key)
+        if result is None:
+            return None
+        self.results.move_to_end(key)
+        return pickle.loads(result)
+
+    # store the result of convert_single();
+    # must be called before the result is modified by the second pass
+    def store(self, key, result):
+        self.results[key] = pickle.dumps(result)
+        self.results.move_to_end(key)
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+
+# the DedupCache of this process, shared by all files converted in it
+_dedup_cache = None
+
+
+def get_dedup_cache(max_size):
+    global _dedup_cache
+    if _dedup_cache is None or _dedup_cache.max_size != max_size:
+        _dedup_cache = DedupCache(max_size)
+    return _dedup_cache
+
+
+# on-disk store of first-pass conversion results shared by all runs (and files) using the same store file,
+# for repeated runs over the same sentences (e.g. while tuning rules).
+# it is content-addressed: a result is keyed by the signature of the input (see sentence_signature()),
+# the version of the converter (see converter_version()) and the options it depends on,
+# so any change to the converter or the input of a sentence makes it miss.
+# a result is the CompactSentence rendered by to_compact() from the result of convert_single(), so that
+# no trees are pickled; besides it, the supertags (with the placeholders of to_compact()) and completeness
+# of each sentence are kept, so the store can be inspected without unpickling.
+# entries not used for the longest time are evicted when the store grows over max_size bytes of results
+class ResultStore:
+    # rows written in one transaction, so that other processes using the store are not locked out for long
+    COMMIT_EVERY = 1000
+
+    def __init__(self, path, max_size, options=()):
+        self.path = path
+        self.max_size = max_size
+        self.prefix = f'{converter_version()}:{options!r}:'.encode()
+
+        self.num_reused = 0
+        self.num_stored = 0
+        self.used = list()    # keys of the rows reused in this run
+        self.num_pending = 0  # rows written since the last commit
+
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS results ('
+                                'key TEXT PRIMARY KEY, '
+                                'supertags TEXT, '
+                                'complete INTEGER, '
+                                'result BLOB, '
+                                'size INTEGER, '
+                                'last_used REAL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)')
+        self.connection.commit()
+
+    def _key(self, signature):
+        return hashlib.sha1(self.prefix + signature.encode()).hexdigest()
+
+    # return the stored CompactSentence of a sentence with this signature, or None
+    def lookup(self, signature):
+        key = self._key(signature)
+        row = self.connection.execute('SELECT result FROM results WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        self.used.append(key)
+        self.num_reused += 1
+        return pickle.loads(row[0])
+
+    # store the CompactSentence of a sentence with this signature, as rendered by to_compact()
+    def store(self, signature, compact):
+        data = pickle.dumps(compact)
+
+        self.connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                                (self._key(signature), ' '.join(compact.tags), int(compact.complete), data,
+                                 len(data), time.time()))
+        self.num_stored += 1
+        self.num_pending += 1
+        if self.num_pending >= self.COMMIT_EVERY:
+            self.connection.commit()
+            self.num_pending = 0
+
+    # evict the least recently used rows until the results fit in max_size bytes
+    def _evict(self):
+        total = self.connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        if total <= self.max_size:
+            return 0
+
+        evicted = list()
+        for key, size in self.connection.execute('SELECT key, size FROM results ORDER BY last_used'):
+            if total <= self.max_size:
+                break
+            evicted.append((key,))
+            total -= size
+        self.connection.executemany('DELETE FROM results WHERE key = ?', evicted)
+        return len(evicted)
+
+    def close(self):
+        now = time.time()
+        self.connection.executemany('UPDATE results SET last_used = ? WHERE key = ?', [(now, key) for key in self.used])
+        num_evicted = self._evict()
+        self.connection.commit()
+        self.connection.close()
+        if num_evicted > 0:
+            logger.info(f"Evicted {num_evicted} results from {self.path}")
@@ -1,3 +1,4 @@
+from collections import namedtuple
 from ud2ccg.rules import rules
 
 RULES = {
@@ -53,39 +54,100 @@ RULES = {
 }
 
 
-# input should be subdtree and subbtree
-def apply_rules(subbtree, dtree, subdtree_root_cat=None):
-    # traverse subbtree top-down
-    subbtree_root = subbtree.get_root()
-    subbtree_root_node = subbtree.get_btree_node(subbtree_root)
+# tokens start..end (inclusive) belong to conjunct `conjunct` (1 or 2) of coordination `group`
+ConjSpan = namedtuple("ConjSpan", ["start", "end", "group", "conjunct"])
+
+
+# deprel -> rule function, filled lazily so that each deprel string is resolved only once
+RULE_CACHE = dict()
+
+
+# decide which rule to apply to a deprel node of the binary tree
+def resolve_rule(deprel):
+    rule = RULE_CACHE.get(deprel)
+    if rule is None:
+        if deprel in RULES:
+            rule = RULES[deprel]
+        elif 'ref-' in deprel:
+            rule = RULES['ref-']
+        else:
+            rule = RULES['default']
+        RULE_CACHE[deprel] = rule
+    return rule
+
+
+# input should be subdtree and subbtree;
+# if a RuleProfiler is given, every rule call is recorded by it;
+# if a SentenceBudget is given, it is checked after every rule call
+def apply_rules(subbtree, dtree, subdtree_root_cat=None, profiler=None, budget=None):
+    # top-down order of subbtree, precomputed at binarization time
+    order = subbtree.get_top_down_order()
 
     # assign category to subbtree_root_node if it exists
     if subdtree_root_cat is not None:
+        subbtree_root_node = subbtree.get_btree_node(order[0][0])
         subbtree_root_node['category'] = subdtree_root_cat
 
-    # apply appropriate rules
-    def _apply_rules(subbtree_root, subbtree, dtree):
-        subbtree_root_node = subbtree.get_btree_node(subbtree_root)
-        subbtree_root_node_type = subbtree_root_node['node_type']
-
-        # decide which rule to apply to current subtree
-        if subbtree_root_node_type == 'deprel':
-            subbtree_root_node_deprel = subbtree_root_node['deprel']
-            if subbtree_root_node_deprel in RULES:
-                rule = RULES[subbtree_root_node_deprel]
-            elif 'ref-' in subbtree_root_node_deprel:
-                rule = RULES['ref-']
+    # apply appropriate rules;
+    # each node already carries its rule, so no string matching is done here
+    if budget is not None and not budget.is_checked:
+        budget = None
+
+    if profiler is None and budget is None:
+        for subbtree_node, rule in order:
+            rule(subbtree_node, subbtree, dtree)
+    else:
+        for subbtree_node, rule in order:
+            if profiler is None:
+                rule(subbtree_node, subbtree, dtree)
             else:
-                rule = RULES['default']
-        else:
-            rule = RULES['token']
+                profiler.call(rule, subbtree_node, subbtree, dtree)
+
+            if budget is not None:
+                budget.check()
+
+    # label the conjuncts of coordination structures
+    assign_conj_groups(subbtree)
+
+
+# give every coordination (conj node) a group id and its two children conjunct ids 1 and 2;
+# a token belongs to the innermost coordination above it.
+# computed in one pass over the top-down order, and stored as
+# intervals of consecutive tokens sharing the same (group, conjunct)
+def assign_conj_groups(subbtree):
+    labels = dict()
+    leaf_labels = dict()
+    num_groups = 0
+
+    for subbtree_node, rule in subbtree.get_top_down_order():
+        label = labels.get(subbtree_node)
+        children = subbtree.get_children(subbtree_node)
+
+        if rule is rules.conj:
+            num_groups += 1
+            for child in children:
+                category_type = subbtree.get_category_type(child)
+                if category_type == 'argument':
+                    labels[child] = (num_groups, 1)
+                elif category_type == 'functor':
+                    labels[child] = (num_groups, 2)
+                else:
+                    labels[child] = label
+        elif label is not None:
+            for child in children:
+                labels[child] = label
 
-        # call function
-        rule(subbtree_root, subbtree, dtree)
+        if len(children) == 0 and label is not None:
+            leaf_labels[subbtree.get_idx(subbtree_node)] = label
 
-        # recursion
-        subbtree_children = subbtree.get_children(subbtree_root)
-        for subbtree_child in subbtree_children:
-            _apply_rules(subbtree_child, subbtree, dtree)
+    conj_spans = []
+    for idx in sorted(leaf_labels):
+        group, conjunct = leaf_labels[idx]
+        if len(conj_spans) > 0:
+            last = conj_spans[-1]
+            if last.end == idx - 1 and last.group == group and last.conjunct == conjunct:
+                conj_spans[-1] = last._replace(end=idx)
+                continue
+        conj_spans.append(ConjSpan(idx, idx, group, conjunct))
 
-    _apply_rules(subbtree_root, subbtree, dtree)
+    subbtree.conj_spans = conj_spans
@@ -0,0 +1,96 @@
+import json
+import time
+from ud2ccg.cat import Index, VariableCategory
+
+
+# upper bounds (in microseconds) of the buckets of the latency histogram;
+# the last bucket collects everything above the largest bound
+HISTOGRAM_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+
+class RuleStats:
+    def __init__(self):
+        self.calls = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BOUNDS) + 1)
+        self.categories = 0   # categories allocated by this rule
+        self.bindings = 0   # variable categories bound (VariableCategory.update) by this rule
+
+    def add(self, elapsed, categories, bindings):
+        self.calls += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+        self.categories += categories
+        self.bindings += bindings
+
+        elapsed_us = elapsed * 1e6
+        bucket = 0
+        while bucket < len(HISTOGRAM_BOUNDS) and elapsed_us > HISTOGRAM_BOUNDS[bucket]:
+            bucket += 1
+        self.histogram[bucket] += 1
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.total_time += other.total_time
+        self.max_time = max(self.max_time, other.max_time)
+        self.categories += other.categories
+        self.bindings += other.bindings
+        for i, count in enumerate(other.histogram):
+            self.histogram[i] += count
+
+    def to_dict(self):
+        histogram = dict()
+        for bound, count in zip(HISTOGRAM_BOUNDS, self.histogram):
+            histogram[f'<={bound}us'] = count
+        histogram[f'>{HISTOGRAM_BOUNDS[-1]}us'] = self.histogram[-1]
+
+        return {
+            'calls': self.calls,
+            'total_time': self.total_time,
+            'mean_time': self.total_time / self.calls if self.calls > 0 else 0.0,
+            'max_time': self.max_time,
+            'categories': self.categories,
+            'bindings': self.bindings,
+            'histogram': histogram,
+        }
+
+
+# records per-rule statistics when passed to apply_rules();
+# apply_rules() calls the rules directly when no profiler is given,
+# so there is no cost when profiling is disabled
+class RuleProfiler:
+    def __init__(self):
+        self.stats = dict()   # rule name -> RuleStats
+
+    def call(self, rule, subbtree_node, subbtree, dtree):
+        # every category gets a new Index when created,
+        # so the Index counter tells how many categories this rule allocated
+        index_before = Index.next_id()
+        bindings_before = VariableCategory.num_bindings
+
+        start = time.perf_counter()
+        rule(subbtree_node, subbtree, dtree)
+        elapsed = time.perf_counter() - start
+
+        name = rule.__name__
+        if name not in self.stats:
+            self.stats[name] = RuleStats()
+        self.stats[name].add(elapsed,
+                             Index.next_id() - index_before,
+                             VariableCategory.num_bindings - bindings_before)
+
+    def merge(self, other):
+        for name, stats in other.stats.items():
+            if name not in self.stats:
+                self.stats[name] = RuleStats()
+            self.stats[name].merge(stats)
+
+    def to_dict(self):
+        names = sorted(self.stats, key=lambda name: self.stats[name].total_time, reverse=True)
+        return {name: self.stats[name].to_dict() for name in names}
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -1,5 +1,4 @@
-import random
-from ud2ccg.cat import Category, VariableCategory, Functor, Index
+from ud2ccg.cat import Category, VariableCategory, Functor, Index, TokenIndex
 from ud2ccg.ccg_rules import solve_functor
 
 
@@ -274,7 +273,7 @@ def comp(subbtree_root, subbtree, dtree):
 
                             # assign index of core eud dependent to argument of argument_cat
                             if core_eud_dep_idx is not None:
-                                argument_cat.right.index = str(core_eud_dep_idx) + ':t'
+                                argument_cat.right.index = TokenIndex(core_eud_dep_idx)
 
             child_node['category'] = argument_cat
 
@@ -440,7 +439,7 @@ def mark(subbtree_root, subbtree, dtree):
 
                             # assign index of core eud dependent to argument of argument_cat
                             if core_eud_dep_idx is not None:
-                                argument_cat.right.index = str(core_eud_dep_idx) + ':t'
+                                argument_cat.right.index = TokenIndex(core_eud_dep_idx)
 
             # adjust the index so that the index of the whole phrase (subbtree_root_cat)
             # is the same as the index of the argument
@@ -627,7 +626,7 @@ def cmod(subbtree_root, subbtree, dtree):
 
                                 # assign index of core eud dependent to argument of argument_cat
                                 if core_eud_dep_idx is not None:
-                                    functor_cat_.right.index = str(core_eud_dep_idx) + ':t'
+                                    functor_cat_.right.index = TokenIndex(core_eud_dep_idx)
 
                 # the "original" category should have the same index as the type-changed category
                 functor_cat_.index = functor_cat.index
@@ -652,7 +651,8 @@ def nmod(subbtree_root, subbtree, dtree):
 
 
 # both children should share the same category,
-# and their categories should have the same index
+# and their categories should have the same index;
+# the two conjuncts are told apart later by apply.assign_conj_groups()
 def conj(subbtree_root, subbtree, dtree):
     subbtree_root_node = subbtree.get_btree_node(subbtree_root)
     subbtree_root_cat = subbtree_root_node['category']
@@ -665,26 +665,9 @@ def conj(subbtree_root, subbtree, dtree):
     for child in children:
         child_node = subbtree.get_btree_node(child)
 
-        if child_node['category_type'] == 'argument':
+        if child_node['category_type'] in ['argument', 'functor']:
             child_node['category'] = subbtree_root_cat
 
-            # TODO need to distinguish two conjuncts; not a good implementation
-            ridx = random.randint(0, 999999999)
-            child_node['conj'] = str(subbtree_root) + ':' + str(ridx)
-            for descendant in subbtree.get_all_descendants(child):
-                descendant_node = subbtree.get_btree_node(descendant)
-                descendant_node['conj'] = str(subbtree_root) + ':' + str(ridx)
-
-        elif child_node['category_type'] == 'functor':
-            child_node['category'] = subbtree_root_cat
-
-            # TODO need to distinguish two conjuncts; not a good implementation
-            ridx = random.randint(0, 999999999)
-            child_node['conj'] = str(subbtree_root) + ':' + str(ridx)
-            for descendant in subbtree.get_all_descendants(child):
-                descendant_node = subbtree.get_btree_node(descendant)
-                descendant_node['conj'] = str(subbtree_root) + ':' + str(ridx)
-
 
 # the conjunct should receive category 'conj'
 def cc(subbtree_root, subbtree, dtree):
@@ -777,7 +760,7 @@ def ref(subbtree_root, subbtree, dtree):
 
                         # assign index of core eud dependent to argument of argument_cat
                         if core_eud_dep_idx is not None:
-                            argument_cat.right.index = str(core_eud_dep_idx) + ':t'
+                            argument_cat.right.index = TokenIndex(core_eud_dep_idx)
 
             # adjust the index so that the index of the whole phrase (subbtree_root_cat)
             # is the same as the index of the argument
@@ -915,7 +898,7 @@ def relcl(subbtree_root, subbtree, dtree):
 
                             # assign index of core eud dependent to argument of argument_cat
                             if core_eud_dep_idx is not None:
-                                functor_cat_.right.index = str(core_eud_dep_idx) + ':t'
+                                functor_cat_.right.index = TokenIndex(core_eud_dep_idx)
 
                 # the "original" category should have the same index as the type-changed category
                 functor_cat_.index = functor_cat.index
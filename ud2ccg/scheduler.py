@@ -0,0 +1,218 @@
+import os
+import time
+import logging
+from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from ud2ccg.transform import convert_conllu, get_output_paths
+from ud2ccg.packed import get_packed_path
+from ud2ccg.utils import check_valid_treebank
+
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+
+# a .conllu file to convert, with its corresponding SUD and UP files (None if missing);
+# size is the size of the .conllu file in bytes, used to run the largest jobs first
+ConversionJob = namedtuple("ConversionJob", ["conllu_path", "export_path", "sud_conllu_path", "up_conllup_path",
+                                             "treebank_name", "split", "size"])
+
+
+def make_job(conllu_path, export_path, sud_conllu_path=None, up_conllup_path=None):
+    filename = os.path.splitext(os.path.basename(conllu_path))[0]
+    filename_parts = filename.split('-')
+
+    return ConversionJob(conllu_path=conllu_path,
+                         export_path=export_path,
+                         sud_conllu_path=sud_conllu_path,
+                         up_conllup_path=up_conllup_path,
+                         treebank_name=filename_parts[0],
+                         split=filename_parts[-1],
+                         size=os.path.getsize(conllu_path))
+
+
+# find every .conllu file of every valid treebank in ud_path, together with its SUD and UP files;
+# the output of each treebank goes to a directory of the same name in export_path
+def discover_jobs(ud_path, export_path, up_path=None, sud_path=None):
+    jobs = list()
+    num_treebanks = 0
+    num_valid_treebanks = 0
+
+    for root, subdirs, files in sorted(os.walk(ud_path)):
+        if 'UD_' in os.path.basename(root):
+            num_treebanks += 1
+            is_valid = check_valid_treebank(root, check_data_splits_opt=False)
+
+            if is_valid:
+                num_valid_treebanks += 1
+                dirpath, dirname = os.path.split(root)
+                dirname_parts = dirname[3:].split('-')
+                lang = dirname_parts[0]
+                treebank = dirname_parts[1]
+
+                converted_path = os.path.join(export_path, dirname)
+                Path(converted_path).mkdir(parents=True, exist_ok=True)
+
+                for file in files:
+                    if file.endswith('.conllu'):
+                        filename = os.path.splitext(file)[0]
+                        filename_parts = filename.split('-')
+                        treebank_name = filename_parts[0]
+                        split = filename_parts[2]
+
+                        conllu_path = os.path.join(root, file)
+
+                        # get corresponding UP path
+                        up_conllup_path = None
+                        if up_path is not None:
+                            up_treebank_dir = 'UP_' + lang + '-' + treebank
+                            up_treebank_file = '-'.join([treebank_name, 'up', split]) + '.conllup'
+                            up_conllup_path = os.path.join(up_path, up_treebank_dir, up_treebank_file)
+                            if not os.path.isfile(up_conllup_path):
+                                up_conllup_path = None
+
+                        # get corresponding SUD path
+                        sud_conllu_path = None
+                        if sud_path is not None:
+                            sud_treebank_dir = 'SUD_' + lang + '-' + treebank
+                            sud_treebank_file = '-'.join([treebank_name, 'sud', split]) + '.conllu'
+                            sud_conllu_path = os.path.join(sud_path, sud_treebank_dir, sud_treebank_file)
+                            if not os.path.isfile(sud_conllu_path):
+                                sud_conllu_path = None
+
+                        jobs.append(make_job(conllu_path, converted_path, sud_conllu_path, up_conllup_path))
+
+    logger.info(f"Valid treebanks: {num_valid_treebanks}/{num_treebanks}")
+    logger.info(f"Files to convert: {len(jobs)}")
+
+    return jobs
+
+
+# run convert_conllu() on a job, returning its slash stats and wall time;
+# with log_to_file, the log of the job is written to <export path>/<file name>.log instead of the console
+def run_job(job, options, default_slash=None, log_to_file=False):
+    root_logger = logging.getLogger()
+    root_handlers = root_logger.handlers
+
+    file_handler = None
+    if log_to_file:
+        filename = os.path.splitext(os.path.basename(job.conllu_path))[0]
+        file_handler = logging.FileHandler(os.path.join(job.export_path, filename + ".log"), mode='w')
+        file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root_logger.handlers = [file_handler]
+
+    start = time.perf_counter()
+    try:
+        slash_stats = convert_conllu(job.conllu_path,
+                                     job.export_path,
+                                     job.sud_conllu_path,
+                                     job.up_conllup_path,
+                                     default_slash=default_slash,
+                                     **options)
+    finally:
+        if file_handler is not None:
+            root_logger.handlers = root_handlers
+            file_handler.close()
+
+    return slash_stats, time.perf_counter() - start
+
+
+# options of convert_conllu() an output depends on, recorded in the manifest
+MANIFEST_OPTIONS = ['convert_crossing_dependencies', 'complete_output_only',
+                    'max_height', 'max_nodes', 'max_categories', 'max_time', 'export_binary']
+
+
+# run the jobs and return a dict of conllu_path -> (status, slash_stats, wall time),
+# where status is 'converted', 'skipped' or 'failed' (slash_stats is None if the job failed).
+# options are keyword arguments of convert_conllu(); get_default_slash(treebank_name, train_slash_stats)
+# gives the default slash direction of a job (None to determine it from the file itself).
+# with num_jobs > 1, jobs run on a pool of processes, largest first, each logging to its own file.
+# with slash_priors_from_train, the train splits run first, and their slash stats are passed to the other splits.
+# with a manifest (see OutputManifest), jobs with up-to-date outputs are skipped, unless force is given,
+# and the manifest is updated after each converted job
+def run_jobs(jobs, options, get_default_slash, num_jobs=1, slash_priors_from_train=False, manifest=None, force=False):
+    results = dict()
+
+    if slash_priors_from_train:
+        phases = [[job for job in jobs if job.split == 'train'],
+                  [job for job in jobs if job.split != 'train']]
+    else:
+        phases = [jobs]
+
+    # slash stats of the train split of each treebank
+    train_slash_stats = dict()
+
+    def _default_slash(job):
+        return get_default_slash(job.treebank_name, train_slash_stats.get(job.treebank_name))
+
+    # the manifest entry of the job's output if it were converted now
+    def _manifest_entry(job, default_slash):
+        job_options = {name: options.get(name) for name in MANIFEST_OPTIONS}
+        job_options['default_slash'] = default_slash
+        output_paths = get_output_paths(job.conllu_path, job.export_path, options.get('compress_output', False))
+        if options.get('export_binary', False):
+            output_paths += (get_packed_path(job.conllu_path, job.export_path),)
+        return manifest.make_entry(output_paths, job.conllu_path, job.sud_conllu_path, job.up_conllup_path,
+                                   job_options)
+
+    def _done(job, status, slash_stats, wall_time, manifest_entry=None):
+        results[job.conllu_path] = (status, slash_stats, wall_time)
+        if slash_priors_from_train and job.split == 'train' and slash_stats is not None:
+            train_slash_stats[job.treebank_name] = slash_stats
+        if status == 'converted' and manifest_entry is not None:
+            manifest.update(manifest_entry, slash_stats)
+
+    for phase in phases:
+        # jobs to run: (job, default slash, manifest entry)
+        to_run = list()
+        for job in phase:
+            default_slash = _default_slash(job)
+            manifest_entry = None
+            if manifest is not None:
+                manifest_entry = _manifest_entry(job, default_slash)
+                recorded = manifest.lookup(manifest_entry)
+                if recorded is not None and not force:
+                    logger.info(f"Skipped {job.conllu_path} (up to date)")
+                    _done(job, 'skipped', recorded['slash_stats'], 0.0)
+                    continue
+            to_run.append((job, default_slash, manifest_entry))
+
+        if num_jobs <= 1:
+            for job, default_slash, manifest_entry in to_run:
+                started = time.perf_counter()
+                try:
+                    slash_stats, wall_time = run_job(job, options, default_slash)
+                except Exception:
+                    logger.exception(f"Failed to convert {job.conllu_path}")
+                    _done(job, 'failed', None, time.perf_counter() - started)
+                    continue
+                _done(job, 'converted', slash_stats, wall_time, manifest_entry)
+            continue
+
+        with ProcessPoolExecutor(max_workers=num_jobs) as executor:
+            futures = dict()
+            for job, default_slash, manifest_entry in sorted(to_run, key=lambda item: item[0].size, reverse=True):
+                future = executor.submit(run_job, job, options, default_slash, True)
+                futures[future] = (job, manifest_entry, time.perf_counter())
+
+            for future in as_completed(futures):
+                job, manifest_entry, submitted = futures[future]
+                try:
+                    slash_stats, wall_time = future.result()
+                    logger.info(f"Converted {job.conllu_path} in {wall_time:.1f}s")
+                    _done(job, 'converted', slash_stats, wall_time, manifest_entry)
+                except Exception:
+                    logger.exception(f"Failed to convert {job.conllu_path}")
+                    _done(job, 'failed', None, time.perf_counter() - submitted)
+
+    return results
+
+
+def log_summary(results, wall_time):
+    logger.info("==============================================")
+    logger.info("Wall time per file:")
+    for conllu_path in sorted(results, key=lambda conllu_path: results[conllu_path][2], reverse=True):
+        status, slash_stats, file_wall_time = results[conllu_path]
+        logger.info(f"  {file_wall_time:8.1f}s  {status:<9}  {conllu_path}")
+    logger.info(f"Total wall time: {wall_time:.1f}s")
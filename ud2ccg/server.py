@@ -0,0 +1,309 @@
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from ud2ccg.argparse import parse_server_args
+from ud2ccg.api import convert_sentences
+from ud2ccg.scheduler import LOG_FORMAT
+
+logging.basicConfig(format=LOG_FORMAT, level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# options of convert_sentences() a request may set, overriding the defaults of the server
+REQUEST_OPTIONS = ['default_slash', 'convert_crossing_dependencies',
+                   'max_height', 'max_nodes', 'max_categories', 'max_time']
+
+
+# raise a ValueError if the request is not a JSON object with a 'conllu' string,
+# optional 'up' and 'sud' strings, and valid values of the REQUEST_OPTIONS it sets
+def check_request(request):
+    if not isinstance(request, dict) or not isinstance(request.get('conllu'), str):
+        raise ValueError("expected a JSON object with a 'conllu' string")
+
+    for name in ['up', 'sud']:
+        if request.get(name) is not None and not isinstance(request[name], str):
+            raise ValueError(f"'{name}' must be a string")
+
+    if request.get('default_slash') not in ['/', '\\', None]:
+        raise ValueError("'default_slash' must be '/', '\\' or null")
+
+    if not isinstance(request.get('convert_crossing_dependencies', False), bool):
+        raise ValueError("'convert_crossing_dependencies' must be true or false")
+
+    # bool is a subclass of int, but not a valid budget
+    for name, types in [('max_height', int), ('max_nodes', int), ('max_categories', int),
+                        ('max_time', (int, float))]:
+        value = request.get(name)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, types) or value < 0):
+            raise ValueError(f"'{name}' must be a non-negative number or null")
+
+
+# convert a batch of requests, each a dict with 'conllu' (and optionally 'up', 'sud' and any of REQUEST_OPTIONS),
+# returning a response for each: {'sentences': [...]} with one SentenceResult (as a dict) per sentence,
+# or {'error': ...} if the request could not be converted; 'internal': True is added to the error response
+# if the conversion failed for another reason than invalid input or options (ValueError or TypeError).
+# runs in a worker process, or in the batching thread of the server when there are no worker processes
+def convert_requests(requests, options):
+    responses = list()
+    for request in requests:
+        request_options = dict(options)
+        for name in REQUEST_OPTIONS:
+            if name in request:
+                request_options[name] = request[name]
+
+        try:
+            results = convert_sentences(request['conllu'], up=request.get('up'), sud=request.get('sud'),
+                                        **request_options)
+            responses.append({'sentences': [result._asdict() for result in results]})
+        except (ValueError, TypeError) as e:
+            responses.append({'error': f'{type(e).__name__}: {e}'})
+        except Exception as e:
+            logger.exception("Failed to convert a request")
+            responses.append({'error': f'{type(e).__name__}: {e}', 'internal': True})
+
+    return responses
+
+
+# run in each worker process when it starts, so that the first request does not pay for it
+def _warm_up():
+    convert_requests([{'conllu': '1\tWarm\twarm\tADJ\t_\t_\t0\troot\t0:root\t_\n'}], {'default_slash': '\\'})
+
+
+# collects the requests of all connections into batches of up to batch_size requests,
+# waiting at most max_wait seconds for a batch to fill up, and converts each batch in a pool of
+# num_workers processes (or in its own thread if num_workers <= 1).
+# also keeps the counters reported by the metrics endpoint
+class RequestBatcher:
+    def __init__(self, options, num_workers=1, batch_size=16, max_wait=0.002):
+        self.options = options
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+
+        self.num_workers = num_workers
+        self.executor = None
+        if num_workers > 1:
+            self._start_executor()
+        else:
+            _warm_up()
+
+        self.queue = queue.Queue()   # (request, future, time received); None to stop
+
+        self.lock = threading.Lock()
+        self.start_time = time.time()
+        self.counters = {'requests': 0, 'errors': 0, 'sentences': 0, 'skipped': 0, 'complete': 0,
+                         'batches': 0, 'latency': 0.0}
+        self.stages = dict()   # stage name -> total time over all converted sentences
+
+        self.thread = threading.Thread(target=self._run, name='batcher', daemon=True)
+        self.thread.start()
+
+    def _start_executor(self):
+        self.executor = ProcessPoolExecutor(max_workers=self.num_workers)
+        for future in [self.executor.submit(_warm_up) for _ in range(self.num_workers)]:
+            future.result()
+
+    # queue a request; the returned future gives its response
+    def submit(self, request):
+        future = Future()
+        self.queue.put((request, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self.queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    item = self.queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            self._dispatch(batch)
+
+    def _dispatch(self, batch):
+        requests = [request for request, future, received in batch]
+        if self.executor is None:
+            try:
+                self._deliver(batch, convert_requests(requests, self.options))
+            except Exception as e:
+                self._fail(batch, e)
+        else:
+            def _done(batch_future):
+                try:
+                    self._deliver(batch, batch_future.result())
+                except Exception as e:
+                    self._fail(batch, e)
+
+            try:
+                batch_future = self.executor.submit(convert_requests, requests, self.options)
+            except BrokenProcessPool as e:
+                # a worker process died (e.g. while converting an earlier batch); start a new pool
+                self._fail(batch, e)
+                logger.warning("Restarting the worker processes")
+                self.executor.shutdown(wait=False)
+                self._start_executor()
+                return
+            batch_future.add_done_callback(_done)
+
+    def _deliver(self, batch, responses):
+        now = time.perf_counter()
+        with self.lock:
+            self.counters['batches'] += 1
+            for (request, future, received), response in zip(batch, responses):
+                self.counters['requests'] += 1
+                self.counters['latency'] += now - received
+                if 'error' in response:
+                    self.counters['errors'] += 1
+                    continue
+                for sentence in response['sentences']:
+                    self.counters['sentences'] += 1
+                    self.counters['skipped'] += sentence['skipped'] is not None
+                    self.counters['complete'] += sentence['complete']
+                    for name, elapsed in sentence['timings'].items():
+                        self.stages[name] = self.stages.get(name, 0.0) + elapsed
+
+        for (request, future, received), response in zip(batch, responses):
+            future.set_result(response)
+
+    # e.g. a worker process died; the responses are marked as internal errors
+    def _fail(self, batch, e):
+        logger.exception("Failed to convert a batch of requests")
+        with self.lock:
+            self.counters['batches'] += 1
+            self.counters['requests'] += len(batch)
+            self.counters['errors'] += len(batch)
+        for request, future, received in batch:
+            future.set_result({'error': f'{type(e).__name__}: {e}', 'internal': True})
+
+    def metrics(self):
+        with self.lock:
+            metrics = dict(self.counters)
+            metrics['stages'] = dict(self.stages)
+        metrics['uptime'] = time.time() - self.start_time
+        metrics['queued'] = self.queue.qsize()
+        metrics['mean_batch_size'] = metrics['requests'] / metrics['batches'] if metrics['batches'] > 0 else 0.0
+        metrics['mean_latency'] = metrics['latency'] / metrics['requests'] if metrics['requests'] > 0 else 0.0
+        return metrics
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+        if self.executor is not None:
+            self.executor.shutdown()
+
+
+# POST /convert with a JSON request (see convert_requests()) returns its JSON response;
+# GET /health and GET /metrics return the state of the server
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _send(self, status, body):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send(200, {'status': 'ok'})
+        elif self.path == '/metrics':
+            self._send(200, self.server.batcher.metrics())
+        else:
+            self._send(404, {'error': f'unknown path {self.path}'})
+
+    def do_POST(self):
+        if self.path != '/convert':
+            self._send(404, {'error': f'unknown path {self.path}'})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            check_request(request)
+        except ValueError as e:
+            self._send(400, {'error': str(e)})
+            return
+
+        response = self.server.batcher.submit(request).result()
+        if 'error' not in response:
+            self._send(200, response)
+        elif response.get('internal', False):
+            self._send(500, response)
+        else:
+            self._send(400, response)
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class UnixHTTPServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    # BaseHTTPRequestHandler expects a (host, port) client address
+    def get_request(self):
+        request, client_address = super().get_request()
+        return request, (self.server_address, 0)
+
+
+def main(args):
+    options = dict(default_slash=args.default_slash,
+                   convert_crossing_dependencies=args.convert_crossing_dependencies,
+                   max_height=args.max_height,
+                   max_nodes=args.max_nodes,
+                   max_categories=args.max_categories,
+                   max_time=args.max_time)
+
+    logger.info(f"Number of workers: {args.num_workers}")
+    logger.info(f"Batch size: {args.batch_size}, max wait: {args.max_wait}s")
+    logger.info(f"Default options: {options}")
+
+    batcher = RequestBatcher(options, args.num_workers, args.batch_size, args.max_wait)
+
+    if args.socket_path is not None:
+        if os.path.exists(args.socket_path):
+            os.remove(args.socket_path)
+        server = UnixHTTPServer(args.socket_path, ConversionRequestHandler)
+        logger.info(f"Listening on {args.socket_path}")
+    else:
+        server = ThreadingHTTPServer((args.host, args.port), ConversionRequestHandler)
+        logger.info(f"Listening on http://{args.host}:{server.server_address[1]}")
+    server.batcher = batcher
+
+    # shut down cleanly on SIGTERM as well as on Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        batcher.close()
+        if args.socket_path is not None and os.path.exists(args.socket_path):
+            os.remove(args.socket_path)
+
+
+if __name__ == "__main__":
+    args = parse_server_args()
+    main(args)
@@ -1,22 +1,51 @@
 import os
+import time
+import pickle
 import logging
+import tempfile
 import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from typing import List, Dict
 from collections import namedtuple
-from ud2ccg.cat import Functor, apply_default_slash_direction, apply_default_category
+from contextlib import nullcontext
+from ud2ccg.cat import Functor, TokenIndex, apply_defaults
 from ud2ccg.dtree import DTree
 from ud2ccg.btree import BTree
-from ud2ccg.preprocessing import preprocess_ap, preprocess_conj, preprocess_ref
-from ud2ccg.reader import read_conllu, read_sud_conllu, read_conllup, UDSentence, SUDToken, UPToken
+from ud2ccg.preprocessing import preprocess
+from ud2ccg.reader import read_conllu, read_sud_conllu, read_conllup, UDSentence, SUDToken, UPSentence
 from ud2ccg.rules.apply import apply_rules
+from ud2ccg.rules.profile import RuleProfiler
+from ud2ccg.budget import SentenceBudget, BudgetExceeded
+from ud2ccg.metrics import StageTimer, get_metrics_path, make_metrics, write_metrics, log_metrics
+from ud2ccg.provenance import ConversionCache, ResultStore, get_dedup_cache, sentence_signature
 from ud2ccg.parser.tree import Token
-from ud2ccg.format import to_auto
+from ud2ccg.format import write_auto
+from ud2ccg.lexicon import get_lexicon_run_path, write_lexicon_run
+from ud2ccg.packed import PackedDerivationWriter, get_packed_path
+from ud2ccg.writer import BufferedWriter, atomic_open
 from ud2ccg.utils import check_crossing_dependencies
-from ud2ccg.evaluate import evaluate_against_up_with_span
+from ud2ccg.evaluate import extract_pas, evaluate_against_up_with_span
 
 
 logger = logging.getLogger(__name__)
 
+# a converted sentence after the second pass, or a spilled one (see to_compact()) before it:
+# - words = word of each token
+# - tags = supertag of each token, as a string
+# - auto = the derivation in .auto format
+# - shape = the shape of each node of the derivation, in the order of the .auto format (see write_auto())
+# - pas = predicate-argument structure extracted from the supertags (see extract_pas())
+# - pending = whether placeholders still have to be patched (see patch_compact())
+# - complete = whether every category of the supertags is assigned (once the placeholders are patched),
+#   see SentenceStatus
+CompactSentence = namedtuple("CompactSentence",
+                             ["sent_id", "words", "tags", "auto", "shape", "pas", "pending", "complete"])
+
+# placeholders rendered in place of undirected slashes and unresolved variable categories
+# by to_compact(), replaced by patch_compact() once the default slash direction is known
+SLASH_PLACEHOLDER = '\x00'
+VARIABLE_PLACEHOLDER = '\x01'
+
 
 # what this function does:
 # - create dtree
@@ -28,11 +57,21 @@ logger = logging.getLogger(__name__)
 def convert_single(
         ud_sentence: UDSentence,
         sud_sentence: List[SUDToken] = None,
-        up_sentence: List[UPToken] = None,
-        slash_stats: Dict[str, int] = None
+        up_sentence: UPSentence = None,
+        slash_stats: Dict[str, int] = None,
+        profiler: RuleProfiler = None,
+        budget: SentenceBudget = None,
+        timer: StageTimer = None
 ):
     sentence = ud_sentence.sentence  # a list of UDTokens
-    sent_id = ud_sentence.sent_id
+
+    # time spent in each stage
+    if timer is None:
+        timer = StageTimer()
+    clock = timer.clock()
+
+    if budget is not None:
+        budget.start()
 
     # store UD data in a dependency tree data structure
     dtree = DTree.from_sentence(sentence)
@@ -41,15 +80,11 @@ def convert_single(
     #   PREPROCESSING   #
     #####################
 
-    # preprocess adpositional phrases
-    if up_sentence is not None:
-        preprocess_ap(dtree, up_sentence)
-
-    # preprocess coordination structures (with EUD)
-    preprocess_conj(dtree)
+    # preprocess adpositional phrases, coordination structures (with EUD)
+    # and ref dependencies in EUD, in a single pass
+    preprocess(dtree, up_sentence)
 
-    # preprocess ref dependencies in EUD
-    preprocess_ref(dtree)
+    clock.lap('preprocess')
 
     ##################
     #   CONVERSION   #
@@ -58,13 +93,17 @@ def convert_single(
     # convert dtree to binary tree
     btree = BTree.from_dtree(dtree)
 
-    # skip if this tree is too deep
-    if btree.height() > 27:
-        logger.debug(f'skipped {sent_id}\t{btree.height()}')
-        return None, None, None, None
+    clock.lap('binarize')
+
+    # stop if this tree is too large, or preprocessing and binarization took too long
+    if budget is not None:
+        budget.check_btree(btree)
+        budget.check()
 
     # apply category assignment rules
-    apply_rules(btree, dtree, subdtree_root_cat=None)
+    apply_rules(btree, dtree, subdtree_root_cat=None, profiler=profiler, budget=budget)
+
+    clock.lap('rules')
 
     # remove dummy ROOT node from btree
     btree_root = btree.get_root()
@@ -80,34 +119,53 @@ def convert_single(
 
     # extract supertags
     supertags = dict()
-    conj_feats = dict()
     for leaf in btree.get_leaf_nodes():
         leaf_node = btree.get_btree_node(leaf)
         leaf_idx = leaf_node['idx']
         supertags[leaf_idx] = leaf_node['category']
-        conj_feats[leaf_idx] = leaf_node['conj']
 
     # in case of 1-node tree
     if len(supertags) == 0:
         leaf_node = btree.get_btree_node(btree.get_root())
         leaf_idx = leaf_node['idx']
         supertags[leaf_idx] = leaf_node['category']
-        conj_feats[leaf_idx] = leaf_node['conj']
 
-    # convert ":t" index marker to actual index
-    def traverse_category(cat):
+    # (coordination group, conjunct) of each token; (0, 0) if not inside a coordination
+    conj_groups = dict()
+    for conj_span in btree.conj_spans:
+        for idx in range(conj_span.start, conj_span.end + 1):
+            conj_groups[idx] = (conj_span.group, conj_span.conjunct)
+
+    clock.lap('postprocess')
+
+    # convert token index references (":t") to actual index;
+    # at the same time, check the supertags of the tokens for missing categories (None)
+    # and collect the categories the second pass has to fix: functors with an undirected slash '|'
+    # and variable categories, keyed by id() as categories can be shared between supertags
+    missing = False
+    unresolved = dict()
+
+    def traverse_category(cat, check):
+        nonlocal missing
         if cat is not None:
-            index = str(cat.index)
-            if ":t" in index:
-                pos = int(index[:-2])
-                index_at_pos = supertags[pos].index
-                cat.index = index_at_pos
+            if isinstance(cat.index, TokenIndex):
+                cat.index = supertags[cat.index.pos].index
+            if check and cat.is_variable:
+                unresolved[id(cat)] = cat
             if isinstance(cat, Functor):
-                traverse_category(cat.left)
-                traverse_category(cat.right)
+                if check and cat.slash == '|':
+                    unresolved[id(cat)] = cat
+                traverse_category(cat.left, check)
+                traverse_category(cat.right, check)
+        elif check:
+            missing = True
 
     for idx, supertag in supertags.items():
-        traverse_category(supertag)
+        traverse_category(supertag, idx > 0)
+
+    status = SentenceStatus(fixups=list(unresolved.values()), missing=missing)
+
+    clock.lap('traverse_category')
 
     # we will later feed these toks and tags to a non-statistical parser
     # that produces every possible tree from these supertags
@@ -117,195 +175,641 @@ def convert_single(
     for idx in sorted(supertags):
         if idx > 0:  # ignore root
             dtree_node = dtree.get_dtree_node(idx)
+            conj_group, conjunct = conj_groups.get(idx, (0, 0))
             tok = Token(
                 word=dtree_node['form'],
                 pos=dtree_node['upos'],
-                feat=conj_feats[idx]
+                conj_group=conj_group,
+                conjunct=conjunct
             )
             toks.append(tok)
             this_tag = supertags[idx]
             tags.append(this_tag)
 
-            # collect slash direction from S|NP-type categories (experimental)
-            if str(this_tag) in ['S\\NP']:
-                slash_stats['\\'] += 1
-            elif str(this_tag) in ['S/NP']:
-                slash_stats['/'] += 1
+    collect_slash_stats(tags, slash_stats)
+
+    clock.lap('postprocess', calls=0)
+
+    return toks, tags, btree, dtree, status
+
+
+# collect slash direction from S|NP-type categories (experimental)
+def collect_slash_stats(tags, slash_stats):
+    for tag in tags:
+        if str(tag) in ['S\\NP']:
+            slash_stats['\\'] += 1
+        elif str(tag) in ['S/NP']:
+            slash_stats['/'] += 1
 
-    return toks, tags, btree, dtree
 
+# structural completeness of a converted sentence, worked out by convert_single() while it walks the supertags:
+# - fixups = categories the second pass has to fix, i.e. undirected slashes and unresolved variable categories
+#   (collected by traverse_category() in convert_single())
+# - missing = whether a category is missing (None) from a supertag
+# the second pass fixes every category in fixups, so a sentence is complete after it unless a category is missing
+class SentenceStatus:
+    def __init__(self, fixups, missing=False):
+        self.fixups = fixups
+        self.missing = missing
 
-def convert_conllu(
-        conllu_path: str,
-        export_path: str,
-        sud_conllu_path: str = None,
-        up_conllup_path: str = None,
-        convert_crossing_dependencies: bool = False,
-        complete_output_only: bool = False
-):
-    logger.info("==============================================")
-    logger.info(f"Converting: {conllu_path}")
-    logger.info(f"  SUD path: {sud_conllu_path}")
-    logger.info(f"   UP path: {up_conllup_path}")
+    @property
+    def is_complete(self):
+        return not self.missing and len(self.fixups) == 0
 
-    basename = os.path.basename(conllu_path)
-    filename = os.path.splitext(basename)[0]
+    # apply the default slash direction and default category to the fixups
+    def resolve(self, default_slash):
+        apply_defaults(self.fixups, default_slash)
+        self.fixups = list()
 
-    # export paths
-    auto_path = os.path.join(export_path, filename + ".auto")
-    lexicon_path = os.path.join(export_path, filename + ".lexicon")
-    f_auto = open(auto_path, "w")
-    f_lex = open(lexicon_path, "w")
 
-    # some conversion stats
-    num_cross = 0
-    num_converted = 0
+# render the sentence as a CompactSentence; any fixups left in status must have been replaced by placeholders
+def render_sentence(sent_id, toks, tags, btree, dtree, status, timer=None):
+    if timer is None:
+        timer = StageTimer()
+    clock = timer.clock()
 
-    # used to store lexemes from converted trees
-    lexicon = dict()
-    Lexeme = namedtuple("Lexeme", ["word", "category"])
+    words = [tok.word for tok in toks]
+    tag_strs = [str(tag) for tag in tags]
+    auto = list()
+    shape = list()
+    write_auto(btree, dtree, auto, shape=shape)
+    auto = ''.join(auto)
+    clock.lap('to_auto')
 
-    # read UD data
-    logger.info("Reading UD data...")
-    ud_sentences = read_conllu(conllu_path)
+    pas = extract_pas(toks, tags)
+    clock.lap('evaluate')
 
-    # read SUD data
-    sud_sentences = None
-    if sud_conllu_path is not None:
-        logger.info("Reading SUD data...")
-        sud_sentences = read_sud_conllu(sud_conllu_path)
+    return CompactSentence(sent_id=sent_id,
+                           words=words,
+                           tags=tag_strs,
+                           auto=auto,
+                           shape=bytes(shape),
+                           pas=pas,
+                           pending=len(status.fixups) > 0,
+                           complete=not status.missing)
 
-    # read UP data
-    up_sentences = None
-    if up_conllup_path is not None:
-        logger.info("Reading UP data...")
-        up_sentences = read_conllup(up_conllup_path, conllu_path)
 
-    # collecting slash direction of S|NP categories across the entire treebank (experimental);
-    # the reason is | slash comes from our rules that assign S|NP to phrases without subject;
-    # the most common slash will be applied to any left-over '|' in the treebank
+# apply the default slash direction and default category to the pending fixups of the sentence,
+# then render it as a CompactSentence
+def fix_sentence(sent_id, toks, tags, btree, dtree, status, default_slash, timer=None):
+    if timer is None:
+        timer = StageTimer()
+    clock = timer.clock()
+
+    status.resolve(default_slash)
+    clock.lap('fixups')
+
+    return render_sentence(sent_id, toks, tags, btree, dtree, status, timer=timer)
+
+
+# render the sentence as a CompactSentence before the default slash direction is known,
+# so that btree and dtree need not be kept until the second pass;
+# the pending fixups are rendered with placeholders.
+# this modifies the categories in tags, so the result must not be used afterwards
+def to_compact(sent_id, toks, tags, btree, dtree, status, timer=None):
+    if timer is None:
+        timer = StageTimer()
+    clock = timer.clock()
+
+    # the predicate-argument structure does not depend on slash directions or variable categories,
+    # so it is not affected by the placeholders
+    for cat in status.fixups:
+        if cat.is_variable:
+            cat.id = VARIABLE_PLACEHOLDER
+        else:
+            cat.slash = SLASH_PLACEHOLDER
+    clock.lap('fixups')
+
+    return render_sentence(sent_id, toks, tags, btree, dtree, status, timer=timer)
+
+
+# replace the placeholders of a sentence rendered by to_compact(),
+# giving the same result as fix_sentence()
+def patch_compact(compact, default_slash):
+    def _patch(text):
+        text = text.replace(SLASH_PLACEHOLDER, default_slash)
+        return text.replace('X_' + VARIABLE_PLACEHOLDER, 'NP')
+
+    return compact._replace(tags=[_patch(tag) for tag in compact.tags],
+                            auto=_patch(compact.auto),
+                            pending=False)
+
+
+# a derivation as a record of an .auto file
+def format_auto_record(sent_id, auto):
+    return 'ID={} PARSER=GOLD NUMPARSE=1\n{}\n'.format(sent_id, auto)
+
+
+# the most common slash direction of S|NP-type categories (see collect_slash_stats())
+def choose_default_slash(slash_stats):
+    if slash_stats['/'] > slash_stats['\\']:
+        return '/'
+    else:
+        return '\\'
+
+
+# a sentence whose conversion went over its budget (see SentenceBudget)
+QuarantinedSentence = namedtuple("QuarantinedSentence", ["sent_id", "reason"])
+
+
+# convert_single(), returning a QuarantinedSentence instead if the sentence goes over its budget
+def convert_within_budget(sent_id, ud_sentence, sud_sentence, up_sentence, slash_stats, profiler, budget, timer):
+    try:
+        return convert_single(ud_sentence, sud_sentence, up_sentence, slash_stats, profiler, budget, timer)
+    except BudgetExceeded as e:
+        logger.debug(f'quarantined {sent_id}\t{e.reason}')
+        return QuarantinedSentence(sent_id=sent_id, reason=e.reason)
+
+
+# convert a batch of sentences, each given as (sent_id, ud_sentence, sud_sentence, up_sentence);
+# this runs in a worker process, so slash stats, rule profile and stage times are collected locally
+def convert_batch(batch, profile_rules=False, budget=None):
     slash_stats = dict()
     slash_stats['/'] = 0
     slash_stats['\\'] = 0
 
-    ############################
-    #   FIRST PASS - CONVERT   #
-    ############################
+    profiler = None
+    if profile_rules:
+        profiler = RuleProfiler()
 
-    logger.info("First pass (conversion)...")
+    timer = StageTimer()
 
-    first_pass = dict()
+    results = list()
+    for sent_id, ud_sentence, sud_sentence, up_sentence in batch:
+        results.append(convert_within_budget(sent_id, ud_sentence, sud_sentence, up_sentence,
+                                             slash_stats, profiler, budget, timer))
 
-    for ud_sentence in tqdm.tqdm(ud_sentences, disable=False):
-        to_convert = True
-        if not convert_crossing_dependencies:
-            if check_crossing_dependencies(ud_sentence.sentence):
-                num_cross += 1
-                to_convert = False
+    return results, slash_stats, profiler, timer
 
-        if to_convert:
-            sent_id = ud_sentence.sent_id
 
-            # get corresponding SUD sentence
-            sud_sentence = None
-            if sud_sentences is not None:
-                if sent_id in sud_sentences:
-                    sud_sentence = sud_sentences[sent_id]
+# convert sentences given as (sent_id, ud_sentence, sud_sentence, up_sentence),
+# yielding the results of convert_within_budget() in the same order.
+# with num_workers > 1, batches of sentences are converted by a pool of processes,
+# and the slash stats, rule profile and stage times of each batch are merged into slash_stats, profiler and timer
+def convert_many(inputs, slash_stats, profiler=None, num_workers=1, batch_size=64, budget=None, timer=None):
+    if timer is None:
+        timer = StageTimer()
 
-            # get corresponding UP sentence
-            up_sentence = None
-            if up_sentences is not None:
-                if sent_id in up_sentences:
-                    up_sentence = up_sentences[sent_id]
+    if num_workers <= 1:
+        for sent_id, ud_sentence, sud_sentence, up_sentence in inputs:
+            yield convert_within_budget(sent_id, ud_sentence, sud_sentence, up_sentence,
+                                        slash_stats, profiler, budget, timer)
+        return
 
-            # convert sentence
-            toks, tags, btree, dtree = convert_single(ud_sentence,
-                                                      sud_sentence,
-                                                      up_sentence,
-                                                      slash_stats)
+    batches = [inputs[i:i + batch_size] for i in range(0, len(inputs), batch_size)]
 
-            if toks is not None:
-                first_pass[sent_id] = (toks, tags, btree, dtree)
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = dict()
+        for batch_idx, batch in enumerate(batches):
+            future = executor.submit(convert_batch, batch, profiler is not None, budget)
+            futures[future] = batch_idx
 
-    # determine most common slash direction
-    if slash_stats['/'] > slash_stats['\\']:
-        default_slash = '/'
-    else:
-        default_slash = '\\'
-
-    logger.info(f"%with crossing dependencies = "
-                f"{num_cross}/{len(ud_sentences)} = "
-                f"{100.0 * num_cross / len(ud_sentences):.2f}%")
-    logger.info(f"Default slash direction for {filename}: {default_slash}")
-    logger.info(f"Forward slash count: {slash_stats['/']}")
-    logger.info("Backward slash count: {}".format(slash_stats['\\']))
-
-    #######################################
-    #   SECOND PASS - FIX SLASH & EXPORT  #
-    #######################################
-
-    logger.info("Second pass (slash fixing & export)...")
-
-    conversion_results = dict()
-
-    for sent_id in tqdm.tqdm(first_pass, disable=False):
-        toks, tags, btree, dtree = first_pass[sent_id]
-
-        for tag in tags:
-            # apply most common slash direction
-            apply_default_slash_direction(tag, default_slash)
-
-            # in case of unsolved variable category
-            apply_default_category(tag)
-
-        # export to CCGBank .auto file format
-        autof = to_auto(btree, dtree)
-
-        # check if the converted tree is complete (no assigned category)
-        is_complete = True
-        for tag in tags:
-            if 'X_' in str(tag) or '|' in str(tag) or 'None' in str(tag):
-                is_complete = False
-                break
-
-        if is_complete:
-            num_converted += 1
-
-        if (complete_output_only and is_complete) or (not complete_output_only):
-            # we don't really need anything other than toks and tags
-            # since the head indices are already unified
-            conversion_results[sent_id] = (toks, tags)
-
-            # write to .auto file
-            f_auto.write('ID={} PARSER=GOLD NUMPARSE=1\n'.format(sent_id))
-            f_auto.write(str(autof))
-            f_auto.write('\n')
-
-            # collect lexemes
-            for i in range(len(toks)):
-                word = toks[i].word
-                category = str(tags[i])
-
-                lex = Lexeme(word=word, category=category)
-                if category is None or str(category) == 'None':
-                    pass
-                if lex in lexicon:
-                    lexicon[lex] = lexicon[lex] + 1
+        # batches may finish in any order;
+        # keep finished batches here until all batches before them have been yielded
+        reorder_buffer = dict()
+        next_batch_idx = 0
+
+        for future in as_completed(futures):
+            reorder_buffer[futures[future]] = future.result()
+
+            while next_batch_idx in reorder_buffer:
+                results, batch_slash_stats, batch_profiler, batch_timer = reorder_buffer.pop(next_batch_idx)
+
+                slash_stats['/'] += batch_slash_stats['/']
+                slash_stats['\\'] += batch_slash_stats['\\']
+                if profiler is not None:
+                    profiler.merge(batch_profiler)
+                timer.merge(batch_timer)
+
+                for result in results:
+                    yield result
+
+                next_batch_idx += 1
+
+
+# paths of the .auto, lexicon and lexicon run files written by convert_conllu()
+def get_output_paths(conllu_path, export_path, compress_output=False):
+    filename = os.path.splitext(os.path.basename(conllu_path))[0]
+
+    auto_path = os.path.join(export_path, filename + ".auto")
+    lexicon_path = os.path.join(export_path, filename + ".lexicon")
+    if compress_output:
+        auto_path += ".gz"
+        lexicon_path += ".gz"
+
+    return auto_path, lexicon_path, get_lexicon_run_path(conllu_path, export_path)
+
+
+def convert_conllu(
+        conllu_path: str,
+        export_path: str,
+        sud_conllu_path: str = None,
+        up_conllup_path: str = None,
+        convert_crossing_dependencies: bool = False,
+        complete_output_only: bool = False,
+        profile_rules: bool = False,
+        incremental: bool = False,
+        num_workers: int = 1,
+        batch_size: int = 64,
+        low_memory: bool = False,
+        default_slash: str = None,
+        compress_output: bool = False,
+        max_height: int = 27,
+        max_nodes: int = None,
+        max_categories: int = None,
+        max_time: float = None,
+        dedup_cache_size: int = 0,
+        result_store_path: str = None,
+        result_store_size: int = 1 << 30,
+        export_binary: bool = False
+):
+    logger.info("==============================================")
+    logger.info(f"Converting: {conllu_path}")
+    logger.info(f"  SUD path: {sud_conllu_path}")
+    logger.info(f"   UP path: {up_conllup_path}")
+
+    # time spent in each stage of the pipeline, written to the metrics file
+    start_time = time.perf_counter()
+    timer = StageTimer()
+
+    # with a default slash direction given in advance (e.g. from a prior table),
+    # each sentence is exported as soon as it is converted and there is no second pass
+    streaming = default_slash is not None
+
+    basename = os.path.basename(conllu_path)
+    filename = os.path.splitext(basename)[0]
+
+    # export paths
+    auto_path, lexicon_path, lexicon_run_path = get_output_paths(conllu_path, export_path, compress_output)
+    profile_path = os.path.join(export_path, filename + ".profile.json")
+    cache_path = os.path.join(export_path, filename + ".cache")
+    quarantine_path = os.path.join(export_path, filename + ".quarantine")
+    metrics_path = get_metrics_path(conllu_path, export_path)
+    packed_path = get_packed_path(conllu_path, export_path)
+
+    # per-sentence limits; sentences over budget are not converted but listed in the quarantine file
+    budget = SentenceBudget(max_height, max_nodes, max_categories, max_time)
+    quarantined = list()
+
+    # output files are written by background threads, and closed even if conversion fails;
+    # the packed derivations (optional) are written alongside the .auto file
+    with BufferedWriter(auto_path, compress_output) as f_auto, \
+            BufferedWriter(lexicon_path, compress_output) as f_lex, \
+            PackedDerivationWriter(packed_path) if export_binary else nullcontext() as f_packed:
+        # some conversion stats
+        num_cross = 0
+        num_converted = 0
+
+        # used to store lexemes from converted trees
+        lexicon = dict()
+        Lexeme = namedtuple("Lexeme", ["word", "category"])
+
+        # read UD data
+        logger.info("Reading UD data...")
+        clock = timer.clock()
+        ud_sentences = read_conllu(conllu_path)
+        clock.lap('read_ud')
+
+        # read SUD data
+        sud_sentences = None
+        if sud_conllu_path is not None:
+            logger.info("Reading SUD data...")
+            sud_sentences = read_sud_conllu(sud_conllu_path)
+            clock.lap('read_sud')
+
+        # read UP data
+        up_sentences = None
+        if up_conllup_path is not None:
+            logger.info("Reading UP data...")
+            up_sentences = read_conllup(up_conllup_path, conllu_path)
+            clock.lap('read_up')
+
+        # collecting slash direction of S|NP categories across the entire treebank (experimental);
+        # the reason is | slash comes from our rules that assign S|NP to phrases without subject;
+        # the most common slash will be applied to any left-over '|' in the treebank
+        slash_stats = dict()
+        slash_stats['/'] = 0
+        slash_stats['\\'] = 0
+
+        # per-rule timing and allocation stats (optional)
+        profiler = None
+        if profile_rules:
+            profiler = RuleProfiler()
+
+        # results of the previous run, reused for sentences not affected by rule changes (optional)
+        cache = None
+        if incremental:
+            cache = ConversionCache(cache_path, (max_height, max_nodes, max_categories, max_time))
+
+        # results of sentences converted earlier in this process, reused for duplicate sentences (optional)
+        dedup_cache = None
+        num_dedup_hits = 0
+        if dedup_cache_size > 0:
+            dedup_cache = get_dedup_cache(dedup_cache_size)
+
+        # results of earlier runs over the same sentences with the same converter, shared by all files (optional)
+        store = None
+        if result_store_path is not None:
+            store = ResultStore(result_store_path, result_store_size, (max_height, max_nodes, max_categories, max_time))
+
+        # PAS of each exported sentence, for evaluation against UP
+        conversion_results = dict()
+
+        # write a converted sentence to the .auto file and collect its lexemes
+        def export(compact):
+            nonlocal num_converted
+
+            export_clock = timer.clock()
+            sent_id = compact.sent_id
+
+            # check if the converted tree is complete (no assigned category)
+            is_complete = compact.complete
+
+            if is_complete:
+                num_converted += 1
+
+            if (complete_output_only and is_complete) or (not complete_output_only):
+                # the head indices are already unified, so the PAS is all we need for evaluation
+                conversion_results[sent_id] = compact.pas
+
+                # write to .auto file
+                f_auto.write(format_auto_record(sent_id, compact.auto))
+                if f_packed is not None:
+                    f_packed.write(compact)
+
+                # collect lexemes
+                for word, category in zip(compact.words, compact.tags):
+                    lex = Lexeme(word=word, category=category)
+                    if lex in lexicon:
+                        lexicon[lex] = lexicon[lex] + 1
+                    else:
+                        lexicon[lex] = 1
+
+            export_clock.lap('write')
+
+        ############################
+        #   FIRST PASS - CONVERT   #
+        ############################
+
+        logger.info("First pass (conversion)...")
+
+        # converted sentences in their original order; sentences with nothing to fix in the second pass
+        # are already rendered as a CompactSentence, the others are kept as (toks, tags, btree, dtree, status)
+        # (with a result store, all of them are CompactSentences, some with placeholders to patch)
+        first_pass = dict()
+
+        # in low-memory mode, converted sentences are not kept in first_pass,
+        # but rendered by to_compact() and spilled to a temporary file
+        f_spill = None
+        num_spilled = 0
+        if low_memory and not streaming:
+            f_spill = tempfile.TemporaryFile()
+
+        # number of sentences with categories to fix in the second pass
+        num_pending = 0
+
+        # sentences to convert, in their original order: (sent_id, ud_sentence, sud_sentence, up_sentence)
+        inputs = list()
+
+        for ud_sentence in ud_sentences:
+            to_convert = True
+            if not convert_crossing_dependencies:
+                if check_crossing_dependencies(ud_sentence.sentence):
+                    num_cross += 1
+                    to_convert = False
+
+            if to_convert:
+                sent_id = ud_sentence.sent_id
+
+                # get corresponding SUD sentence
+                sud_sentence = None
+                if sud_sentences is not None:
+                    if sent_id in sud_sentences:
+                        sud_sentence = sud_sentences[sent_id]
+
+                # get corresponding UP sentence
+                up_sentence = None
+                if up_sentences is not None:
+                    if sent_id in up_sentences:
+                        up_sentence = up_sentences[sent_id]
+
+                inputs.append((sent_id, ud_sentence, sud_sentence, up_sentence))
+
+        # reuse results of the previous run if possible (key = position in inputs)
+        cached_results = dict()
+        signatures = dict()
+        if cache is not None:
+            for i, (sent_id, ud_sentence, sud_sentence, up_sentence) in enumerate(inputs):
+                signatures[i] = sentence_signature(ud_sentence, sud_sentence, up_sentence)
+                result = cache.lookup(sent_id, signatures[i])
+                if result is not None:
+                    cached_results[i] = result
+
+        # take the results of the other sentences from the result store if possible (positions in inputs)
+        stored_results = set()
+        if store is not None:
+            for i, (sent_id, ud_sentence, sud_sentence, up_sentence) in enumerate(inputs):
+                if i in cached_results:
+                    continue
+                if i not in signatures:
+                    signatures[i] = sentence_signature(ud_sentence, sud_sentence, up_sentence)
+                result = store.lookup(signatures[i])
+                if result is not None:
+                    cached_results[i] = result
+                    stored_results.add(i)
+
+        # sentences with the same input as one converted before them take its result from the dedup cache;
+        # key in the dedup cache of each sentence, and positions in inputs of the duplicates
+        dedup_keys = dict()
+        duplicates = set()
+        if dedup_cache is not None:
+            budget_options = (max_height, max_nodes, max_categories, max_time)
+            seen = set()
+            for i, (sent_id, ud_sentence, sud_sentence, up_sentence) in enumerate(inputs):
+                if i in cached_results:
+                    continue
+                if i not in signatures:
+                    signatures[i] = sentence_signature(ud_sentence, sud_sentence, up_sentence)
+                dedup_keys[i] = (signatures[i], budget_options)
+                if dedup_keys[i] in seen or dedup_keys[i] in dedup_cache:
+                    duplicates.add(i)
+                seen.add(dedup_keys[i])
+
+        # convert the remaining sentences; results come back in the original order
+        converted_results = convert_many([inputs[i] for i in range(len(inputs))
+                                          if i not in cached_results and i not in duplicates],
+                                         slash_stats,
+                                         profiler,
+                                         num_workers,
+                                         batch_size,
+                                         budget,
+                                         timer)
+
+        for i, (sent_id, ud_sentence, sud_sentence, up_sentence) in enumerate(tqdm.tqdm(inputs, disable=False)):
+            if i in cached_results:
+                result = cached_results.pop(i)
+                # the result store holds CompactSentences, whose supertags give the same slash stats;
+                # they cannot be put in the incremental cache, which needs the trees to know the rules fired
+                if i in stored_results:
+                    collect_slash_stats(result.tags, slash_stats)
+                else:
+                    collect_slash_stats(result[1], slash_stats)
+            else:
+                result = None
+                if i in duplicates:
+                    result = dedup_cache.lookup(dedup_keys[i])
+                    if result is not None:
+                        num_dedup_hits += 1
+                        collect_slash_stats(result[1], slash_stats)
+                    else:
+                        # evicted since, or the sentence it duplicates was quarantined
+                        result = convert_within_budget(sent_id, ud_sentence, sud_sentence, up_sentence,
+                                                       slash_stats, profiler, budget, timer)
                 else:
-                    lexicon[lex] = 1
+                    result = next(converted_results)
+                if isinstance(result, QuarantinedSentence):
+                    quarantined.append(result)
+                    continue
+                if cache is not None:
+                    cache.store(sent_id, signatures[i], result)
+                if dedup_cache is not None and dedup_keys[i] not in dedup_cache:
+                    dedup_cache.store(dedup_keys[i], result)
+
+            # with a result store, every sentence is rendered by to_compact() in the first pass,
+            # as that is what the store holds
+            if store is not None:
+                if i in stored_results:
+                    # stored for the first sentence with the same input, which may have had another sent_id
+                    compact = result._replace(sent_id=sent_id)
+                else:
+                    compact = to_compact(sent_id, *result, timer)
+                    store.store(signatures[i], compact)
+
+                if compact.pending:
+                    num_pending += 1
+
+                if complete_output_only and not compact.complete:
+                    continue
+
+                if streaming:
+                    if compact.pending:
+                        patch_clock = timer.clock()
+                        compact = patch_compact(compact, default_slash)
+                        patch_clock.lap('fixups')
+                    export(compact)
+                elif low_memory:
+                    pickle.dump(compact, f_spill)
+                    num_spilled += 1
+                else:
+                    first_pass[sent_id] = compact
+                continue
 
-    # write lexicon to file
-    lexicon_keys = sorted(lexicon.keys())
-    for k in lexicon_keys:
-        f_lex.write('{:<15}\t{:>50}\t\t{}\n'.format(k.word, k.category, lexicon[k]))
+            toks, tags, btree, dtree, status = result
+            if toks is not None:
+                if status.fixups:
+                    num_pending += 1
+
+                # a sentence with a missing category stays incomplete after the second pass,
+                # so there is no need to render it if only complete sentences are exported
+                if complete_output_only and status.missing:
+                    continue
+
+                if streaming:
+                    export(fix_sentence(sent_id, toks, tags, btree, dtree, status, default_slash, timer))
+                elif low_memory:
+                    pickle.dump(to_compact(sent_id, toks, tags, btree, dtree, status, timer), f_spill)
+                    num_spilled += 1
+                elif status.fixups:
+                    first_pass[sent_id] = (toks, tags, btree, dtree, status)
+                else:
+                    first_pass[sent_id] = render_sentence(sent_id, toks, tags, btree, dtree, status, timer=timer)
+
+        if cache is not None:
+            cache.save()
+            logger.info(f"Reused {cache.num_reused} cached sentences, converted {cache.num_converted}")
+
+        if store is not None:
+            store.close()
+            logger.info(f"Reused {store.num_reused} results from {result_store_path}, stored {store.num_stored}")
+
+        if dedup_cache is not None:
+            logger.info(f"Duplicate sentences taken from the dedup cache: {num_dedup_hits}/{len(inputs)}")
+
+        # determine most common slash direction
+        if not streaming:
+            default_slash = choose_default_slash(slash_stats)
+
+        logger.info(f"%with crossing dependencies = "
+                    f"{num_cross}/{len(ud_sentences)} = "
+                    f"{100.0 * num_cross / len(ud_sentences):.2f}%")
+        logger.info(f"Default slash direction for {filename}: {default_slash}"
+                    f"{' (given in advance)' if streaming else ''}")
+        logger.info(f"Forward slash count: {slash_stats['/']}")
+        logger.info("Backward slash count: {}".format(slash_stats['\\']))
+        logger.info(f"Sentences with pending fixups: {num_pending}/{len(inputs)}")
+        logger.info(f"Quarantined sentences: {len(quarantined)}/{len(inputs)}")
+
+        #######################################
+        #   SECOND PASS - FIX SLASH & EXPORT  #
+        #######################################
+
+        if not streaming:
+            logger.info("Second pass (slash fixing & export)...")
+
+            def _patched(compact):
+                if compact.pending:
+                    patch_clock = timer.clock()
+                    compact = patch_compact(compact, default_slash)
+                    patch_clock.lap('fixups')
+                return compact
+
+            def _second_pass():
+                if low_memory:
+                    f_spill.seek(0)
+                    for _ in range(num_spilled):
+                        yield _patched(pickle.load(f_spill))
+                    f_spill.close()
+                else:
+                    for sent_id in first_pass:
+                        if isinstance(first_pass[sent_id], CompactSentence):
+                            yield _patched(first_pass[sent_id])
+                        else:
+                            yield fix_sentence(sent_id, *first_pass[sent_id], default_slash, timer)
+
+            for compact in tqdm.tqdm(_second_pass(), total=num_spilled if low_memory else len(first_pass), disable=False):
+                export(compact)
+
+        # write sentences over budget to file
+        with atomic_open(quarantine_path, 'w') as f_quarantine:
+            for quarantined_sentence in quarantined:
+                f_quarantine.write(f'{quarantined_sentence.sent_id}\t{quarantined_sentence.reason}\n')
+
+        # write rule profile to file
+        if profiler is not None:
+            profiler.dump(profile_path)
+            logger.info(f"Rule profile written to {profile_path}")
+
+        # write lexicon to file
+        clock = timer.clock()
+        lexicon_keys = sorted(lexicon.keys())
+        for k in lexicon_keys:
+            f_lex.write('{:<15}\t{:>50}\t\t{}\n'.format(k.word, k.category, lexicon[k]))
+
+        # sorted run of the lexicon, merged with those of other files by merge_lexicons()
+        write_lexicon_run(lexicon_run_path, lexicon)
+
+    # including the time to flush the output files
+    clock.lap('write', calls=0)
 
     # evaluate against UP
     logger.info("----------------------------------------------")
     logger.info("Evaluating conversion results against UP...")
 
     if up_conllup_path is not None:
+        clock = timer.clock()
         recall, precision, f1, core_arg_recall, mod_arg_recall \
             = evaluate_against_up_with_span(conversion_results, up_sentences)
+        clock.lap('evaluate', calls=0)
 
         # summarize stats
         conversion_rate = num_converted / len(ud_sentences)
@@ -319,6 +823,19 @@ def convert_conllu(
         logger.info(f"  Core-arg recall : {core_arg_recall:.4f}")
         logger.info(f"  Mod-arg recall  : {mod_arg_recall:.4f}")
 
-    # close writers
-    f_auto.close()
-    f_lex.close()
+    # write stage times and throughput to file
+    metrics = make_metrics(conllu_path,
+                           timer,
+                           time.perf_counter() - start_time,
+                           len(ud_sentences),
+                           sum(len(ud_sentence.sentence) for ud_sentence in ud_sentences),
+                           num_converted,
+                           len(quarantined),
+                           num_dedup_hits)
+    write_metrics(metrics_path, metrics)
+
+    logger.info("----------------------------------------------")
+    logger.info(f"Stage times and throughput (written to {metrics_path}):")
+    log_metrics(metrics)
+
+    return slash_stats
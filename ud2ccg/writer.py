@@ -0,0 +1,106 @@
+import os
+import gzip
+import queue
+import threading
+from contextlib import contextmanager
+
+
+# writes text to a file from a background thread, so that file I/O (and compression) overlaps with conversion;
+# text is collected into buffers of about buffer_size characters, which are handed to the writer thread
+# through a queue of at most max_queued buffers (write() blocks when the queue is full).
+# use as a context manager, or call close(), to make sure everything is written and the file is closed.
+# the text is written to a temporary file that replaces the file at path only when closed without error,
+# so a file at path is always complete
+class BufferedWriter:
+    def __init__(self, path, compress=False, buffer_size=1 << 20, max_queued=8):
+        self.path = path
+        self.tmp_path = path + '.tmp'
+        if compress:
+            self.f = gzip.open(self.tmp_path, 'wt')
+        else:
+            self.f = open(self.tmp_path, 'w')
+
+        self.buffer_size = buffer_size
+        self.buffer = list()
+        self.buffered = 0
+
+        self.queue = queue.Queue(maxsize=max_queued)
+        self.error = None   # exception raised in the writer thread, re-raised by write() and close()
+        self.closed = False
+
+        self.thread = threading.Thread(target=self._run, name=f'writer-{path}', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while True:
+            chunk = self.queue.get()
+            if chunk is None:
+                break
+
+            # after an error, keep taking buffers from the queue so that write() does not block
+            if self.error is None:
+                try:
+                    self.f.write(chunk)
+                except Exception as e:
+                    self.error = e
+
+    def _flush_buffer(self):
+        if self.buffer:
+            self.queue.put(''.join(self.buffer))
+            self.buffer = list()
+            self.buffered = 0
+
+    def write(self, text):
+        if self.error is not None:
+            raise self.error
+
+        self.buffer.append(text)
+        self.buffered += len(text)
+        if self.buffered >= self.buffer_size:
+            self._flush_buffer()
+
+    # with discard, the text written so far is thrown away and the file at path is left untouched
+    def close(self, discard=False):
+        if self.closed:
+            return
+        self.closed = True
+
+        try:
+            if not discard:
+                self._flush_buffer()
+        finally:
+            self.queue.put(None)
+            self.thread.join()
+            self.f.close()
+
+            if discard or self.error is not None:
+                os.remove(self.tmp_path)
+            else:
+                os.replace(self.tmp_path, self.path)
+
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    # the file is only written if the with block finishes without an exception
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close(discard=exc_type is not None)
+
+
+# open a file for writing through a temporary file, which replaces the file at path
+# only if the with block finishes without an exception
+@contextmanager
+def atomic_open(path, mode='w'):
+    tmp_path = path + '.tmp'
+    f = open(tmp_path, mode)
+    try:
+        yield f
+    except BaseException:
+        f.close()
+        os.remove(tmp_path)
+        raise
+    else:
+        f.close()
+        os.replace(tmp_path, path)